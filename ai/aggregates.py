@@ -0,0 +1,214 @@
+"""Incremental per-account PFM aggregates persisted in SQLite.
+
+Each account keeps running totals per month, merchant, payment mode,
+transaction type and spend category, plus one overall row. Transactions are
+deduplicated by TransactionId: a transaction seen before with the same values
+is skipped, and one whose values changed has its old contribution subtracted
+before the new one is added. Transactions without a TransactionId cannot be
+told apart from a re-post of the same purchase, so they are not stored; the
+ingest result counts them as skipped. Reading the aggregates touches only the totals
+table, so it costs the same however long the account history is.
+
+Spend categories are assigned when a transaction is ingested, so editing
+merchant_categories.csv only affects transactions ingested afterwards.
+"""
+import math
+import os
+import sqlite3
+import threading
+
+from ingest import load_transactions
+
+AGGREGATE_DB = os.environ.get("PFM_AGGREGATE_DB", "aggregates.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    account_id TEXT NOT NULL,
+    transaction_id TEXT NOT NULL,
+    signed_amount REAL,
+    amount REAL,
+    month TEXT,
+    merchant TEXT,
+    payment_mode TEXT,
+    transaction_type TEXT,
+    category TEXT,
+    PRIMARY KEY (account_id, transaction_id)
+);
+CREATE TABLE IF NOT EXISTS totals (
+    account_id TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    net REAL NOT NULL,
+    spent REAL NOT NULL,
+    amount_sum REAL NOT NULL,
+    amount_count INTEGER NOT NULL,
+    PRIMARY KEY (account_id, dimension, key)
+);
+CREATE INDEX IF NOT EXISTS totals_by_net ON totals (account_id, dimension, net);
+"""
+
+# Record fields (after the transaction id) that feed each totals dimension
+DIMENSIONS = [("month", 2), ("merchant", 3), ("payment_mode", 4), ("type", 5), ("category", 6)]
+# Insights keys for the dimensions reported as {key: net amount}
+INSIGHT_DIMENSIONS = [
+    ("spending_by_payment_mode", "payment_mode"),
+    ("monthly_spending_trend", "month"),
+    ("transaction_type_breakdown", "type"),
+]
+UPSERT = """
+INSERT INTO totals (account_id, dimension, key, count, net, spent, amount_sum, amount_count)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account_id, dimension, key) DO UPDATE SET
+    count = count + excluded.count,
+    net = net + excluded.net,
+    spent = spent + excluded.spent,
+    amount_sum = amount_sum + excluded.amount_sum,
+    amount_count = amount_count + excluded.amount_count
+"""
+
+
+def _value(v):
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return None
+    return v if isinstance(v, (int, float)) else str(v)
+
+
+def _add_contribution(deltas, record, sign):
+    """Add (sign=1) or remove (sign=-1) one transaction record's share of the totals."""
+    signed, amount = record[0], record[1]
+    net = signed or 0.0
+    measures = (sign, sign * net, sign * min(net, 0.0), sign * (amount or 0.0), sign * (amount is not None))
+    keys = [("all", "")] + [(dimension, record[i]) for dimension, i in DIMENSIONS if record[i] is not None]
+    for key in keys:
+        totals = deltas.setdefault(key, [0, 0.0, 0.0, 0.0, 0])
+        for i, measure in enumerate(measures):
+            totals[i] += measure
+
+
+class AggregateStore:
+    def __init__(self, path=AGGREGATE_DB, classifier=None):
+        self.classifier = classifier
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _records(self, transactions):
+        """{transaction id: record} for the transactions that have an id, and how many do not."""
+        df = load_transactions(transactions)
+        categories = [None] * len(df)
+        if self.classifier is not None and "MerchantName" in df.columns:
+            categories = [
+                self.classifier.classify(str(m)) if m is not None else None
+                for m in df["MerchantName"].astype(object).where(df["MerchantName"].notna(), None)
+            ]
+        months = df["TransactionDateTime"].dt.strftime("%Y-%m")
+        columns = [
+            df["SignedAmount"], df["Amount"], months,
+            df.get("MerchantName"), df.get("PaymentModes"), df.get("TransactionType"),
+        ]
+        columns = [[None] * len(df) if c is None else c.astype(object).tolist() for c in columns]
+        records = {}
+        missing_ids = 0
+        for i, transaction_id in enumerate(df["TransactionId"].tolist()):
+            if transaction_id is None or transaction_id == "":
+                missing_ids += 1
+                continue
+            # A repeated id within one batch keeps its last version
+            records[str(transaction_id)] = tuple(_value(c[i]) for c in columns) + (categories[i],)
+        return records, missing_ids
+
+    def _existing(self, account_id, transaction_ids):
+        existing = {}
+        ids = list(transaction_ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._conn.execute(
+                "SELECT transaction_id, signed_amount, amount, month, merchant, payment_mode, "
+                "transaction_type, category FROM transactions "
+                f"WHERE account_id = ? AND transaction_id IN ({','.join('?' * len(chunk))})",
+                [account_id, *chunk],
+            )
+            for row in rows:
+                existing[row[0]] = tuple(row[1:])
+        return existing
+
+    def ingest(self, account_id, transactions):
+        """Fold new or changed transactions into an account's totals.
+
+        Returns counts of inserted, updated and unchanged transactions, and of
+        those skipped for having no TransactionId.
+        """
+        records, missing_ids = self._records(transactions)
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": missing_ids}
+        with self._lock, self._conn:
+            existing = self._existing(account_id, records)
+            deltas = {}
+            changed = []
+            for transaction_id, record in records.items():
+                old = existing.get(transaction_id)
+                if old == record:
+                    counts["unchanged"] += 1
+                    continue
+                if old is not None:
+                    _add_contribution(deltas, old, -1)
+                    counts["updated"] += 1
+                else:
+                    counts["inserted"] += 1
+                _add_contribution(deltas, record, 1)
+                changed.append((account_id, transaction_id, *record))
+            if not changed:
+                return counts
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", changed
+            )
+            self._conn.executemany(
+                UPSERT, [(account_id, dimension, key, *totals) for (dimension, key), totals in deltas.items()]
+            )
+            self._conn.execute("DELETE FROM totals WHERE account_id = ? AND count <= 0", (account_id,))
+        return counts
+
+    def _totals(self, account_id, dimension, order="key", limit=-1):
+        return self._conn.execute(
+            f"SELECT key, count, net, spent, amount_sum, amount_count FROM totals "
+            f"WHERE account_id = ? AND dimension = ? ORDER BY {order} LIMIT ?",
+            (account_id, dimension, limit),
+        ).fetchall()
+
+    def has_account(self, account_id):
+        with self._lock:
+            return bool(self._totals(account_id, "all"))
+
+    def insights(self, account_id, top_n=5):
+        """The compute_insights() dict for an account, read from the running totals."""
+        with self._lock:
+            overall = self._totals(account_id, "all")
+            _, count, net, spent, amount_sum, amount_count = overall[0] if overall else ("", 0, 0.0, 0.0, 0.0, 0)
+            insights = {
+                "total_transactions": count,
+                "total_spent": round(spent, 2),
+                "total_income": round(net - spent, 2),
+                "net_balance_change": round(net, 2),
+                "average_transaction_amount": round(amount_sum / amount_count, 2) if amount_count else math.nan,
+            }
+            merchants = self._totals(account_id, "merchant", order="net", limit=top_n)
+            if merchants:
+                insights["top_spending_merchants"] = {row[0]: row[2] for row in merchants}
+            for name, dimension in INSIGHT_DIMENSIONS:
+                rows = self._totals(account_id, dimension)
+                if rows or dimension == "month":
+                    insights[name] = {row[0]: row[2] for row in rows}
+        return insights
+
+    def spending(self, account_id):
+        """(total debit spend, {category: debit spend}) for card recommendations."""
+        with self._lock:
+            overall = self._totals(account_id, "all")
+            categories = self._totals(account_id, "category")
+        total_spent = -overall[0][3] if overall else 0.0
+        return total_spent, {row[0]: -row[3] for row in categories}
@@ -1,16 +1,80 @@
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Header, Request
+from fastapi import Query as QueryParam
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-import matplotlib.pyplot as plt
 import base64
-from io import BytesIO
-import pandas as pd
-from pydantic import BaseModel
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import gzip
+import hashlib
+from pydantic import BaseModel, Field
+from aggregates import AggregateStore
+from cache import ResultCache, etag_matches
+from cards import spending_summary
+from catalog import Catalog
+from categorize import CATEGORIES_FILE, MerchantClassifier
+from ingest import load_transactions
+from metrics import CONTENT_TYPE, ERRORS, PAYLOAD_ROWS, REGISTRY, REQUEST_SECONDS, observe_stage, stage
+from insights import InsightsAccumulator, compact_insights, compute_insights, filter_transactions
+from portfolio import PortfolioPool, PortfolioPoolSaturated
+from profiler import SamplingProfiler
+from render import IMAGE_TYPES, ImageNotAcceptable, RenderPool, RenderPoolSaturated, accepts_encoding, negotiate_image, server_timing
+from stream import StreamFormatError, is_ndjson, transaction_batches
 
-app = FastAPI()
+STARTED_AT = time.time()
+logger = logging.getLogger(__name__)
+
+# Dashboard charts are drawn in worker processes so they never block the event loop
+render_pool = RenderPool()
+# Repeat views of the same transactions are served from here without recomputation;
+# keys change with the merchant categories, which are only read at startup
+result_cache = ResultCache(data_files=[CATEGORIES_FILE])
+# Intent and card catalogs, reloaded in the background when their files change
+catalog = Catalog()
+# Off unless AI_PROFILE_INTERVAL_MS is set; see GET /debug/profile
+profiler = SamplingProfiler()
+# Running per-account totals, so repeat views only pay for new transactions. The
+# store keeps every posted transaction, so it is off unless PFM_ACCOUNT_STORE=1
+# and is opened at startup rather than on import
+ACCOUNT_STORE_ENABLED = os.environ.get("PFM_ACCOUNT_STORE") == "1"
+aggregate_store = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global aggregate_store
+    if ACCOUNT_STORE_ENABLED:
+        aggregate_store = AggregateStore(classifier=merchant_classifier)
+    # Warm-up runs in the background so the worker starts serving straight away;
+    # the intent catalog (and scikit-learn) otherwise loads on the first /predict,
+    # and the portfolio workers on the first portfolio too large to aggregate inline
+    warmups = [asyncio.create_task(render_pool.warm())]
+    if os.environ.get("AI_PREWARM_CATALOG") == "1":
+        warmups.append(asyncio.create_task(catalog.current()))
+    if os.environ.get("AI_PREWARM_PORTFOLIO") == "1":
+        warmups.append(asyncio.create_task(portfolio_pool.warm()))
+    watcher = asyncio.create_task(catalog.watch())
+    profiler.start()
+    yield
+    for task in (watcher, *warmups):
+        task.cancel()
+    profiler.stop()
+    render_pool.shutdown()
+    portfolio_pool.shutdown()
+    if aggregate_store is not None:
+        aggregate_store.close()
+        aggregate_store = None
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow requests from Next.js frontend
 app.add_middleware(
@@ -22,123 +86,223 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template rather than the raw path keeps the label set small
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method, route=route.path if route else "unmatched", status=status,
+        )
+
+
+def record_error(endpoint, e):
+    ERRORS.inc(endpoint=endpoint, exception=type(e).__name__)
+    logger.exception("%s failed", endpoint)
+
+
+def pfm_insights(transactions, endpoint="pfm-dashboard-image"):
+    PAYLOAD_ROWS.observe(len(transactions), endpoint=endpoint)
+    with stage(endpoint, "normalize"):
+        df = load_transactions(transactions)
+    with stage(endpoint, "aggregate"):
+        return compute_insights(df)
+
+
 # Accepts POST with JSON body: [ ...list of transactions... ]
+# Returns {"image_base64": ...} by default, or the raw image when the Accept
+# header asks for image/png, image/svg+xml or image/webp.
 @app.post("/pfm-dashboard-image")
-async def pfm_dashboard_image(request: Request):
+async def pfm_dashboard_image(
+    request: Request,
+    format: Optional[str] = QueryParam(None, pattern="^(png|svg|webp)$"),
+    dpi: int = QueryParam(100, ge=30, le=300),
+    width: float = QueryParam(14, gt=1, le=40),
+    height: float = QueryParam(8, gt=1, le=40),
+):
     try:
-        transactions = await request.json()
-        if not isinstance(transactions, list) or len(transactions) == 0:
-            return JSONResponse(content={"error": "No transactions provided."}, status_code=400)
-        df = pd.json_normalize(transactions)
-        df["TransactionDateTime"] = pd.to_datetime(df["TransactionDateTime"], errors="coerce")
-        # Support both nested and flat Amount
-        if "Amount.Amount" in df.columns:
-            df["Amount.Amount"] = pd.to_numeric(df["Amount.Amount"], errors="coerce")
-        elif "Amount" in df.columns:
-            df["Amount.Amount"] = pd.to_numeric(df["Amount"].apply(lambda x: x.get("Amount") if isinstance(x, dict) else None), errors="coerce")
-        else:
-            df["Amount.Amount"] = None
-        df["SignedAmount"] = df.apply(
-            lambda x: x["Amount.Amount"] if str(x.get("CreditDebitIndicator", "")).lower() == "credit"
-            else -x["Amount.Amount"], axis=1
-        )
-        insights = {}
-        insights["total_transactions"] = len(df)
-        insights["total_spent"] = round(df[df["SignedAmount"] < 0]["SignedAmount"].sum(), 2)
-        insights["total_income"] = round(df[df["SignedAmount"] > 0]["SignedAmount"].sum(), 2)
-        insights["net_balance_change"] = round(df["SignedAmount"].sum(), 2)
-        if "MerchantDetails.MerchantName" in df.columns:
-            top_merchants = (
-                df.groupby("MerchantDetails.MerchantName")["SignedAmount"]
-                .sum()
-                .sort_values()
-                .head(5)
+        # The response type is settled and a slot reserved before the body is
+        # read, so a refused request costs nothing
+        binary_format = negotiate_image(request.headers.get("accept"), format)
+        with render_pool.admit():
+            with stage("pfm-dashboard-image", "parse"):
+                transactions = await request.json()
+            if not isinstance(transactions, list) or len(transactions) == 0:
+                return JSONResponse(content={"error": "No transactions provided."}, status_code=400)
+            return await dashboard_image_response(
+                request, "pfm-dashboard-image", transactions,
+                lambda: run_in_threadpool(pfm_insights, transactions), binary_format, format, dpi, width, height,
             )
-            insights["top_spending_merchants"] = top_merchants.to_dict()
-        if "PaymentModes" in df.columns:
-            insights["spending_by_payment_mode"] = (
-                df.groupby("PaymentModes")["SignedAmount"].sum().to_dict()
-            )
-        df["Month"] = df["TransactionDateTime"].dt.to_period("M")
-        monthly_trend = df.groupby("Month")["SignedAmount"].sum().to_dict()
-        insights["monthly_spending_trend"] = {str(k): v for k, v in monthly_trend.items()}
-        insights["average_transaction_amount"] = round(df["Amount.Amount"].mean(), 2)
-        if "TransactionType" in df.columns:
-            insights["transaction_type_breakdown"] = (
-                df.groupby("TransactionType")["SignedAmount"].sum().to_dict()
+    except ImageNotAcceptable as e:
+        return not_acceptable_response(e)
+    except RenderPoolSaturated as e:
+        return busy_response(e)
+    except Exception as e:
+        record_error("pfm-dashboard-image", e)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+async def accumulate_stream(request, endpoint, classifier=None):
+    """Fold a streamed upload into an InsightsAccumulator; returns it and the body's sha256."""
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    accumulator = InsightsAccumulator(classifier)
+    seconds = {"normalize": 0.0, "aggregate": 0.0}
+
+    def fold(batch):
+        batch_started = time.perf_counter()
+        df = load_transactions(batch)
+        normalized = time.perf_counter()
+        accumulator.add(df)
+        seconds["normalize"] += normalized - batch_started
+        seconds["aggregate"] += time.perf_counter() - normalized
+
+    batches = transaction_batches(request.stream(), ndjson=is_ndjson(request.headers.get("content-type")), digest=digest)
+    async for batch in batches:
+        await run_in_threadpool(fold, batch)
+    # Reading and decoding the body is whatever the batches did not spend in the threadpool
+    seconds["parse"] = time.perf_counter() - started - sum(seconds.values())
+    for name, value in seconds.items():
+        observe_stage(endpoint, name, value)
+    PAYLOAD_ROWS.observe(accumulator.total_transactions, endpoint=endpoint)
+    return accumulator, digest.hexdigest()
+
+
+# Same as /pfm-dashboard-image, for NDJSON or JSON array bodies too large to buffer
+@app.post("/pfm-dashboard-image/stream")
+async def pfm_dashboard_image_stream(
+    request: Request,
+    format: Optional[str] = QueryParam(None, pattern="^(png|svg|webp)$"),
+    dpi: int = QueryParam(100, ge=30, le=300),
+    width: float = QueryParam(14, gt=1, le=40),
+    height: float = QueryParam(8, gt=1, le=40),
+):
+    try:
+        binary_format = negotiate_image(request.headers.get("accept"), format)
+        with render_pool.admit():
+            accumulator, body_sha256 = await accumulate_stream(request, "pfm-dashboard-image/stream")
+            if accumulator.total_transactions == 0:
+                return JSONResponse(content={"error": "No transactions provided."}, status_code=400)
+
+            async def insights():
+                return accumulator.insights()
+
+            return await dashboard_image_response(
+                request, "pfm-dashboard-image/stream", {"sha256": body_sha256}, insights,
+                binary_format, format, dpi, width, height,
             )
-        # Prepare data series
-        monthly_series = pd.Series(insights["monthly_spending_trend"])
-        payment_mode_series = pd.Series(insights["spending_by_payment_mode"]) if "spending_by_payment_mode" in insights and insights["spending_by_payment_mode"] else pd.Series()
-        type_breakdown_series = pd.Series(insights["transaction_type_breakdown"]) if "transaction_type_breakdown" in insights and insights["transaction_type_breakdown"] else pd.Series()
-        merchant_series = pd.Series(insights["top_spending_merchants"]) if "top_spending_merchants" in insights and insights["top_spending_merchants"] else pd.Series()
-        fig, axs = plt.subplots(2, 2, figsize=(14, 8))
-        # Chart 1: Monthly Spending Trend
-        if not monthly_series.empty and monthly_series.dtype.kind in 'fi':
-            monthly_series.plot(kind="bar", color="skyblue", ax=axs[0, 0])
-            axs[0, 0].set_title("Monthly Spending Trend")
-            axs[0, 0].set_ylabel("Net Amount (AED)")
-            axs[0, 0].set_xlabel("Month")
-            axs[0, 0].tick_params(axis='x', rotation=45)
-        else:
-            axs[0, 0].text(0.5, 0.5, "No Data", ha='center', va='center')
-            axs[0, 0].set_title("Monthly Spending Trend")
-            axs[0, 0].axis('off')
-        # Chart 2: Spending by Payment Mode
-        if not payment_mode_series.empty:
-            payment_mode_series.plot(kind="bar", color="orange", ax=axs[0, 1])
-            axs[0, 1].set_title("Spending by Payment Mode")
-            axs[0, 1].set_ylabel("Amount (AED)")
-            axs[0, 1].tick_params(axis='x', rotation=45)
-        else:
-            axs[0, 1].text(0.5, 0.5, "No Data", ha='center', va='center')
-            axs[0, 1].set_title("Spending by Payment Mode")
-            axs[0, 1].axis('off')
-        # Chart 3: Transaction Type Breakdown
-        if not type_breakdown_series.empty:
-            type_breakdown_series.plot(kind="bar", color="green", ax=axs[1, 0])
-            axs[1, 0].set_title("Transaction Type Breakdown")
-            axs[1, 0].set_ylabel("Amount (AED)")
-            axs[1, 0].tick_params(axis='x', rotation=45)
-        else:
-            axs[1, 0].text(0.5, 0.5, "No Data", ha='center', va='center')
-            axs[1, 0].set_title("Transaction Type Breakdown")
-            axs[1, 0].axis('off')
-        # Chart 4: Top Spending Merchants
-        if not merchant_series.empty:
-            merchant_series.plot(kind="bar", color="purple", ax=axs[1, 1])
-            axs[1, 1].set_title("Top Spending Merchants")
-            axs[1, 1].set_ylabel("Amount (AED)")
-            axs[1, 1].tick_params(axis='x', rotation=45)
-        else:
-            axs[1, 1].text(0.5, 0.5, "No Data", ha='center', va='center')
-            axs[1, 1].set_title("Top Spending Merchants")
-            axs[1, 1].axis('off')
-        plt.tight_layout()
-        buf = BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        return JSONResponse(content={"image_base64": img_base64})
+    except ImageNotAcceptable as e:
+        return not_acceptable_response(e)
+    except RenderPoolSaturated as e:
+        return busy_response(e)
+    except StreamFormatError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
     except Exception as e:
+        record_error("pfm-dashboard-image/stream", e)
         return JSONResponse(content={"error": str(e)}, status_code=500)
-from fastapi import FastAPI
-from pydantic import BaseModel
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
 
-# Load your CSV
-df = pd.read_csv("end_points.csv")
 
-# Load credit card information
-with open("creditcard.txt", "r", encoding="utf-8") as f:
-    credit_cards_text = f.read()
+def busy_response(e):
+    return JSONResponse(content={"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+
+
+def not_acceptable_response(e):
+    return JSONResponse(content={"error": str(e)}, status_code=406, headers={"Vary": "Accept"})
+
+
+async def dashboard_image_response(request, endpoint, payload, get_insights, binary_format, format, dpi, width, height):
+    """Render (or serve from cache) the dashboard for ``payload``.
+
+    ``binary_format`` is negotiate_image()'s answer (None for base64 JSON).
+    Runs inside render_pool.admit().
+    """
+    fmt = binary_format or format or "png"
+    gzip_body = binary_format == "svg" and accepts_encoding(request.headers.get("accept-encoding"), "gzip")
+    key = await run_in_threadpool(
+        result_cache.key, "pfm-dashboard-image", payload,
+        fmt=fmt, dpi=dpi, width=width, height=height, binary=bool(binary_format), gzip=gzip_body,
+    )
+    etag = result_cache.etag(key)
+    headers = {"ETag": etag, "Vary": "Accept, Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = result_cache.get(key)
+    if body is None:
+        insights = await get_insights()
+        image, timings = await render_pool.render(insights, fmt=fmt, dpi=dpi, figsize=(width, height))
+        encode_started = time.perf_counter()
+        if binary_format is None:
+            body = JSONResponse(content={"image_base64": base64.b64encode(image).decode('utf-8')}).body
+        elif gzip_body:
+            body = gzip.compress(image)
+        else:
+            body = image
+        # "encode" covers the worker's savefig plus the base64/gzip done here
+        timings["encode"] += (time.perf_counter() - encode_started) * 1000
+        for name, ms in timings.items():
+            observe_stage(endpoint, name, ms / 1000)
+        result_cache.set(key, body)
+        headers["Server-Timing"] = server_timing(timings)
+    if binary_format is None:
+        return Response(content=body, media_type="application/json", headers=headers)
+    if gzip_body:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=IMAGE_TYPES[binary_format], headers=headers)
+
+
+class InsightsQuery(BaseModel):
+    transactions: list
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    account_ids: Optional[List[str]] = None
+    top_n: int = Field(5, ge=1, le=100)
+
+
+class PFMInsights(BaseModel):
+    total_transactions: int
+    total_spent: float
+    total_income: float
+    net_balance_change: float
+    average_transaction_amount: Optional[float] = None
+    monthly_spending_trend: Dict[str, float] = {}
+    top_spending_merchants: Dict[str, float] = {}
+    spending_by_payment_mode: Dict[str, float] = {}
+    transaction_type_breakdown: Dict[str, float] = {}
+
+
+def insights_for_query(query):
+    df = filter_transactions(
+        load_transactions(query.transactions), query.start_date, query.end_date, query.account_ids
+    )
+    return PFMInsights(**compact_insights(compute_insights(df, top_n=query.top_n)))
+
+
+# The dashboard aggregates as JSON, for clients that draw their own charts
+@app.post("/pfm-insights", response_model=PFMInsights)
+def pfm_insights_json(query: InsightsQuery, request: Request):
+    if len(query.transactions) == 0:
+        return JSONResponse(content={"error": "No transactions provided."}, status_code=400)
+    key = result_cache.key("pfm-insights", query.model_dump(mode="json"))
+    etag = result_cache.etag(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = result_cache.get(key)
+    if body is None:
+        try:
+            body = insights_for_query(query).model_dump_json().encode("utf-8")
+        except Exception as e:
+            record_error("pfm-insights", e)
+            return JSONResponse(content={"error": str(e)}, status_code=500)
+        result_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
-# Build TF-IDF model on the descriptions
-vectorizer = TfidfVectorizer(stop_words='english')
-X = vectorizer.fit_transform(df['description'])
 
 # Define input model
 class Query(BaseModel):
@@ -146,21 +310,17 @@ class Query(BaseModel):
 
 @app.post("/predict")
 def predict(query: Query):
-    # Transform input description
-    query_vec = vectorizer.transform([query.description])
-
-    # Compute cosine similarity
-    similarity = cosine_similarity(query_vec, X).flatten()
-
-    # Find best match
-    best_idx = similarity.argmax()
-    best_match = df.iloc[best_idx]
-    best_score = float(similarity[best_idx])
+    snapshot = catalog.snapshot
+    # Encode and search, or reuse the result for a repeated description; a cache
+    # miss also records the vectorize and similarity stages
+    with stage("predict", "match"):
+        (best_idx, best_score), = snapshot.matcher.match(query.description)
+    best_match = snapshot.intents.iloc[best_idx]
     
-    print(best_match)
+    logger.debug("Matched %r to %r (score %.3f)", query.description, best_match["description"], best_score)
     
     # Check if the match is good enough and if the service is ready
-    if best_score < 0.3:  # Low similarity threshold
+    if best_score < snapshot.matcher.min_score:  # Low similarity threshold
         return {
             "input_description": query.description,
             "matched_description": "Service not available",
@@ -194,221 +354,323 @@ def predict(query: Query):
     }
 
 
+class BatchQuery(BaseModel):
+    descriptions: List[str] = Field(..., min_length=1, max_length=10000)
+    top_k: int = Field(3, ge=1, le=20)
+
+
+@app.post("/predict/batch")
+def predict_batch(query: BatchQuery):
+    snapshot = catalog.snapshot
+    PAYLOAD_ROWS.observe(len(query.descriptions), endpoint="predict/batch")
+    # One encoding and one index search for the whole batch
+    with stage("predict/batch", "vectorize"):
+        query_vec = snapshot.matcher.encode(query.descriptions)
+    with stage("predict/batch", "similarity"):
+        results = snapshot.matcher.index.search(query_vec, query.top_k)
+    intents = snapshot.intents
+    descriptions, ctas = intents["description"].tolist(), intents["cta"].tolist()
+    routes, statuses = intents["route"].tolist(), intents["status"].fillna("ready").tolist()
+    # Like /predict, scores below the matcher's threshold are not matches;
+    # a description with none left gets an empty list
+    min_score = snapshot.matcher.min_score
+    return {
+        "results": [
+            {
+                "input_description": description,
+                "matches": [
+                    {
+                        "matched_description": descriptions[i],
+                        "cta": ctas[i],
+                        "deeplink": routes[i],
+                        "similarity_score": float(score),
+                        "status": statuses[i],
+                    }
+                    for i, score in zip(indices.tolist(), scores.tolist())
+                    if score >= min_score
+                ],
+            }
+            for description, (indices, scores) in zip(query.descriptions, results)
+        ]
+    }
+
 # Optional: simple root route
 @app.get("/")
 def home():
     return {"message": "Function name prediction API is running 🚀"}
 
 # Credit card recommendations based on transactions
+merchant_classifier = MerchantClassifier.from_csv(CATEGORIES_FILE)
+
 class TransactionData(BaseModel):
     transactions: list
 
 @app.post("/credit-card-recommendations")
-def credit_card_recommendations(data: TransactionData):
+def credit_card_recommendations(data: TransactionData, request: Request):
+    # Keys cover the card catalog too, so a reload changes the ETag
+    snapshot = catalog.snapshot
+    key = result_cache.key("credit-card-recommendations", data.transactions, cards=snapshot.cards_sha256)
+    etag = result_cache.etag(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = result_cache.get(key)
+    if body is None:
+        result = recommend_cards(data.transactions, snapshot)
+        body = JSONResponse(content=jsonable_encoder(result)).body
+        if "error" not in result:
+            result_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+# Same as /credit-card-recommendations, for NDJSON or JSON array bodies too large to buffer
+@app.post("/credit-card-recommendations/stream")
+async def credit_card_recommendations_stream(request: Request):
     try:
-        transactions = data.transactions
-        df_trans = pd.json_normalize(transactions)
-        
-        # Parse transaction data
-        if "Amount.Amount" in df_trans.columns:
-            df_trans["Amount.Amount"] = pd.to_numeric(df_trans["Amount.Amount"], errors="coerce")
-        elif "Amount" in df_trans.columns:
-            df_trans["Amount.Amount"] = pd.to_numeric(df_trans["Amount"].apply(lambda x: x.get("Amount") if isinstance(x, dict) else None), errors="coerce")
-        else:
-            df_trans["Amount.Amount"] = 0
-            
-        df_trans["SignedAmount"] = df_trans.apply(
-            lambda x: x["Amount.Amount"] if str(x.get("CreditDebitIndicator", "")).lower() == "credit"
-            else -x["Amount.Amount"], axis=1
+        accumulator, body_sha256 = await accumulate_stream(
+            request, "credit-card-recommendations/stream", merchant_classifier
         )
+    except StreamFormatError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        record_error("credit-card-recommendations/stream", e)
+        return JSONResponse(content={"error": str(e), "recommendations": []})
+    snapshot = await catalog.current()
+    key = result_cache.key(
+        "credit-card-recommendations/stream", {"sha256": body_sha256}, cards=snapshot.cards_sha256
+    )
+    etag = result_cache.etag(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = result_cache.get(key)
+    if body is None:
+        with stage("credit-card-recommendations/stream", "score"):
+            result = score_cards(accumulator.total_spent, accumulator.category_spend, snapshot)
+        body = JSONResponse(content=jsonable_encoder(result)).body
+        result_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def recommend_cards(transactions, snapshot=None):
+    endpoint = "credit-card-recommendations"
+    try:
+        PAYLOAD_ROWS.observe(len(transactions), endpoint=endpoint)
+        with stage(endpoint, "parse"):
+            df_trans = load_transactions(transactions)
         
         # Calculate spending patterns
         total_spent = abs(df_trans[df_trans["SignedAmount"] < 0]["SignedAmount"].sum())
         
         # Categorize spending
-        travel_keywords = ['airline', 'hotel', 'flight', 'travel', 'booking']
-        food_keywords = ['talabat', 'restaurant', 'cafe', 'coffee', 'food', 'dining', 'delivery']
-        grocery_keywords = ['lulu', 'supermarket', 'grocery', 'carrefour']
-        entertainment_keywords = ['vox', 'cinema', 'movie', 'entertainment']
-        
-        travel_spend = 0
-        food_spend = 0
-        grocery_spend = 0
-        entertainment_spend = 0
-        
-        for _, row in df_trans.iterrows():
-            merchant = str(row.get('MerchantDetails.MerchantName', '')).lower()
-            amount = abs(row['SignedAmount']) if row['SignedAmount'] < 0 else 0
-            
-            if any(keyword in merchant for keyword in travel_keywords):
-                travel_spend += amount
-            elif any(keyword in merchant for keyword in food_keywords):
-                food_spend += amount
-            elif any(keyword in merchant for keyword in grocery_keywords):
-                grocery_spend += amount
-            elif any(keyword in merchant for keyword in entertainment_keywords):
-                entertainment_spend += amount
-        
-        recommendations = []
-        scored_cards = []
-        
-        # Score each card based on spending patterns
-        # Travel Card
-        travel_score = travel_spend / max(total_spent, 1) * 100
-        if travel_spend > 0:
-            scored_cards.append({
-                "score": travel_score,
-                "card": {
-                    "name": "Traveller Credit Card",
-                    "reason": f"You spent AED {travel_spend:.2f} ({travel_score:.0f}% of total) on travel. Get 10% cashback on flights and hotels.",
-                    "benefits": ["10% cashback on airline tickets", "10% cashback on hotel stays", "0 foreign currency fees", "Complimentary lounge access", "Travel insurance"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Save up to AED {(travel_spend * 0.10):.2f} per month",
-                    "category": "travel"
-                }
-            })
-        
-        # Food/Dining Card
-        food_score = food_spend / max(total_spent, 1) * 100
-        if food_spend > 0:
-            scored_cards.append({
-                "score": food_score,
-                "card": {
-                    "name": "Talabat ADCB Credit Card",
-                    "reason": f"You spent AED {food_spend:.2f} ({food_score:.0f}% of total) on dining. Get 35% back on talabat orders.",
-                    "benefits": ["35% back on talabat orders", "Unlimited free delivery", "Up to AED 750 welcome bonus", "Lounge access"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Save up to AED {(food_spend * 0.35):.2f} per month",
-                    "category": "dining"
-                }
-            })
-        
-        # Grocery Card
-        grocery_score = grocery_spend / max(total_spent, 1) * 100
-        if grocery_spend > 0:
-            scored_cards.append({
-                "score": grocery_score,
-                "card": {
-                    "name": "Lulu Platinum Credit Card",
-                    "reason": f"You spent AED {grocery_spend:.2f} ({grocery_score:.0f}% of total) at groceries. Earn 8 LuLu Points per AED.",
-                    "benefits": ["Earn up to 8 LuLu Points per AED", "Complimentary airport lounge access", "Buy 1 Get 1 Free Movie tickets", "Free for life"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Earn up to {(grocery_spend * 8):.0f} LuLu Points per month",
-                    "category": "grocery"
-                }
-            })
-        
-        # Entertainment Card
-        entertainment_score = entertainment_spend / max(total_spent, 1) * 100
-        if entertainment_spend > 0:
-            scored_cards.append({
-                "score": entertainment_score,
-                "card": {
-                    "name": "Etihad Guest Credit Card",
-                    "reason": f"You spent AED {entertainment_spend:.2f} on entertainment. Earn miles on every purchase plus dining benefits.",
-                    "benefits": ["Earn Etihad Guest Miles", "Priority boarding", "Extra baggage allowance", "Lounge access"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Earn up to {(entertainment_spend * 2):.0f} miles per month",
-                    "category": "entertainment"
-                }
-            })
-        
-        # Always include general cashback card (high spend)
-        if total_spent > 1000:
-            scored_cards.append({
-                "score": 50,  # Medium priority
-                "card": {
-                    "name": "365 Cashback Credit Card",
-                    "reason": f"With AED {total_spent:.2f} monthly spend, maximize rewards with up to 6% cashback on everyday purchases.",
-                    "benefits": ["Up to 6% cashback on everyday spends", "AED 365 welcome bonus", "Up to AED 1,000 monthly cashback", "Hotel discounts"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Save up to AED {min(total_spent * 0.06, 1000):.2f} per month",
-                    "category": "cashback"
-                }
-            })
-        
-        # Premium card for high spenders
-        if total_spent > 5000:
-            scored_cards.append({
-                "score": 60,
-                "card": {
-                    "name": "Infinite Credit Card",
-                    "reason": f"Your high spending of AED {total_spent:.2f} qualifies you for premium benefits and exclusive privileges.",
-                    "benefits": ["Unlimited airport lounge access", "Golf privileges", "Personal concierge", "Travel insurance up to AED 5M"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Premium benefits worth AED {(total_spent * 0.08):.2f} per month",
-                    "category": "premium"
-                }
-            })
-        
-        # Essential card for low spenders
-        if total_spent < 1000:
-            scored_cards.append({
-                "score": 80,
-                "card": {
-                    "name": "Essential Cashback Credit Card",
-                    "reason": "Perfect starter card with no annual fees and guaranteed 1% cashback on all purchases.",
-                    "benefits": ["1% cashback on all purchases", "Up to AED 1000 cashback monthly", "Free for life", "Dining & Shopping Discounts"],
-                    "apply_url": "https://www.adcb.com/en/personal/cards/",
-                    "potential_savings": f"Save up to AED {(total_spent * 0.01):.2f} per month",
-                    "category": "basic"
-                }
-            })
-        
-        # Islamic card option (always include as alternative)
-        scored_cards.append({
-            "score": 30,
-            "card": {
-                "name": "Islamic Credit Card",
-                "reason": "Sharia-compliant card with no interest charges and ethical banking benefits.",
-                "benefits": ["Sharia-compliant", "No interest charges", "Cashback on purchases", "Travel benefits"],
-                "apply_url": "https://www.adcb.com/en/personal/cards/",
-                "potential_savings": f"Ethical banking with rewards",
-                "category": "islamic"
-            }
-        })
-        
-        # Sort by score (highest first) and take top cards
-        scored_cards.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Always show at least 3 different types of cards
-        recommendations = []
-        seen_categories = set()
-        
-        # First pass: Add high-scoring cards with unique categories
-        for item in scored_cards:
-            if len(recommendations) >= 4:
-                break
-            card = item["card"]
-            if card["category"] not in seen_categories:
-                recommendations.append(card)
-                seen_categories.add(card["category"])
-        
-        # Second pass: Fill remaining slots with any other cards
-        for item in scored_cards:
-            if len(recommendations) >= 4:
-                break
-            card = item["card"]
-            if card not in recommendations:
-                recommendations.append(card)
-        
-        # Remove category field before returning (internal use only)
-        for rec in recommendations:
-            rec.pop("category", None)
-        
-        return {
-            "spending_summary": {
-                "total_spent": round(total_spent, 2),
-                "travel_spend": round(travel_spend, 2),
-                "food_spend": round(food_spend, 2),
-                "grocery_spend": round(grocery_spend, 2),
-                "entertainment_spend": round(entertainment_spend, 2)
-            },
-            "recommendations": recommendations[:4]  # Return top 4 diverse recommendations
-        }
+        with stage(endpoint, "categorize"):
+            category_spend = merchant_classifier.spend_by_category(df_trans)
+        with stage(endpoint, "score"):
+            return score_cards(total_spent, category_spend, snapshot)
     except Exception as e:
+        record_error(endpoint, e)
         return {"error": str(e), "recommendations": []}
 
+
+def score_cards(total_spent, category_spend, snapshot=None):
+    # Every card in cards.json is scored at once; see cards.py for the rules
+    cards = (snapshot or catalog.snapshot).cards
+    return {
+        "spending_summary": spending_summary(total_spent, category_spend),
+        "recommendations": cards.recommend(total_spent, category_spend)
+    }
+
+# Per-account aggregates for multi-account portfolios run in their own worker processes
+portfolio_pool = PortfolioPool(classifier=merchant_classifier)
+
+
+class PortfolioQuery(BaseModel):
+    accounts: Dict[str, list] = Field(..., min_length=1, description="Transactions keyed by account id")
+    top_n: int = Field(5, ge=1, le=100)
+
+
+class PortfolioView(BaseModel):
+    insights: PFMInsights
+    recommendations: dict
+
+
+class PortfolioInsights(BaseModel):
+    accounts: Dict[str, PortfolioView]
+    consolidated: PortfolioView
+
+
+def portfolio_views(accumulators, top_n, snapshot):
+    """A PortfolioView per accumulator, with the cards for all of them scored in one product."""
+    customers = [(accumulator.total_spent, accumulator.category_spend) for accumulator in accumulators]
+    recommendations = snapshot.cards.recommend_many(customers)
+    return [
+        PortfolioView(
+            insights=PFMInsights(**compact_insights(accumulator.insights(top_n=top_n))),
+            recommendations={"spending_summary": spending_summary(*customer), "recommendations": cards},
+        )
+        for accumulator, customer, cards in zip(accumulators, customers, recommendations)
+    ]
+
+
+# Insights and card recommendations per account and for all accounts together
+@app.post("/portfolio-insights", response_model=PortfolioInsights)
+async def portfolio_insights(query: PortfolioQuery, request: Request):
+    if not any(query.accounts.values()):
+        return JSONResponse(content={"error": "No transactions provided."}, status_code=400)
+    snapshot = await catalog.current()
+    key = await run_in_threadpool(
+        result_cache.key, "portfolio-insights", query.accounts, top_n=query.top_n, cards=snapshot.cards_sha256
+    )
+    etag = result_cache.etag(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = result_cache.get(key)
+    headers = {"ETag": etag}
+    if body is None:
+        PAYLOAD_ROWS.observe(sum(map(len, query.accounts.values())), endpoint="portfolio-insights")
+        try:
+            with portfolio_pool.admit():
+                partials, timings = await portfolio_pool.partials(query.accounts)
+        except PortfolioPoolSaturated as e:
+            return busy_response(e)
+        except Exception as e:
+            record_error("portfolio-insights", e)
+            return JSONResponse(content={"error": str(e)}, status_code=500)
+        observe_stage("portfolio-insights", "partials", timings["partials"] / 1000)
+        with stage("portfolio-insights", "merge"):
+            consolidated = InsightsAccumulator(merchant_classifier)
+            for partial in partials.values():
+                consolidated.merge(partial)
+        with stage("portfolio-insights", "score"):
+            *views, consolidated_view = portfolio_views([*partials.values(), consolidated], query.top_n, snapshot)
+            result = PortfolioInsights(accounts=dict(zip(partials, views)), consolidated=consolidated_view)
+        body = result.model_dump_json().encode("utf-8")
+        result_cache.set(key, body)
+        headers["Server-Timing"] = server_timing(timings)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def admin_denied(x_admin_token):
+    """A 403 response unless X-Admin-Token matches AI_ADMIN_TOKEN, else None.
+
+    Without AI_ADMIN_TOKEN every admin request is refused.
+    """
+    admin_token = os.environ.get("AI_ADMIN_TOKEN")
+    if not admin_token:
+        return JSONResponse(content={"error": "Set AI_ADMIN_TOKEN to enable this route."}, status_code=403)
+    if x_admin_token != admin_token:
+        return JSONResponse(content={"error": "Invalid admin token."}, status_code=403)
+    return None
+
+
+def account_store_denied(x_admin_token):
+    # Account data is only for trusted callers, which authenticate like the admin routes
+    if aggregate_store is None:
+        return JSONResponse(
+            content={"error": "Per-account aggregates are disabled; set PFM_ACCOUNT_STORE=1."}, status_code=404
+        )
+    return admin_denied(x_admin_token)
+
+
+@app.post("/accounts/{account_id}/transactions")
+def ingest_account_transactions(account_id: str, data: TransactionData, x_admin_token: Optional[str] = Header(None)):
+    denied = account_store_denied(x_admin_token)
+    if denied:
+        return denied
+    try:
+        return aggregate_store.ingest(account_id, data.transactions)
+    except Exception as e:
+        record_error("accounts/transactions", e)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.get("/accounts/{account_id}/pfm-insights", response_model=PFMInsights)
+def account_pfm_insights(
+    account_id: str, top_n: int = QueryParam(5, ge=1, le=100), x_admin_token: Optional[str] = Header(None)
+):
+    denied = account_store_denied(x_admin_token)
+    if denied:
+        return denied
+    if not aggregate_store.has_account(account_id):
+        return JSONResponse(content={"error": "No transactions ingested for this account."}, status_code=404)
+    return PFMInsights(**compact_insights(aggregate_store.insights(account_id, top_n=top_n)))
+
+
+@app.get("/accounts/{account_id}/credit-card-recommendations")
+def account_credit_card_recommendations(account_id: str, x_admin_token: Optional[str] = Header(None)):
+    denied = account_store_denied(x_admin_token)
+    if denied:
+        return denied
+    if not aggregate_store.has_account(account_id):
+        return JSONResponse(content={"error": "No transactions ingested for this account."}, status_code=404)
+    return score_cards(*aggregate_store.spending(account_id))
+
+@app.post("/admin/reload-catalog")
+def reload_catalog(x_admin_token: Optional[str] = Header(None)):
+    # Needs AI_ADMIN_TOKEN and a matching X-Admin-Token header
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    try:
+        catalog.reload()
+    except Exception as e:
+        return JSONResponse(content={"error": str(e), **catalog.status()}, status_code=500)
+    return catalog.status()
+
+
+@app.get("/catalog-status")
+def catalog_status():
+    return catalog.status()
+
+
+@app.get("/ready")
+def ready():
+    components = {
+        "intent_catalog": catalog.status(),
+        "render_pool": render_pool.status(),
+        "portfolio_pool": portfolio_pool.status(),
+    }
+    return {
+        "warm": all(component["warm"] for component in components.values()),
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - STARTED_AT, 1),
+        "components": components,
+    }
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    return result_cache.stats()
+
+
+REGISTRY.callback(
+    "ai_cache_hits_total", "Responses served from the result cache, by tier.",
+    lambda: {"memory": result_cache.hits, "disk": result_cache.disk_hits}, kind="counter", labelname="tier",
+)
+REGISTRY.callback("ai_cache_misses_total", "Result cache lookups that missed.", lambda: result_cache.misses, kind="counter")
+REGISTRY.callback("ai_render_in_flight", "Dashboard image requests holding a render slot, from reading their body to sending the image.", lambda: render_pool.in_flight)
+REGISTRY.callback("ai_render_queue_depth", "Dashboard renders waiting for a free worker.", lambda: render_pool.queue_depth)
+REGISTRY.callback("ai_render_workers", "Dashboard render worker processes.", lambda: render_pool.workers)
+REGISTRY.callback("ai_portfolio_in_flight", "Portfolios being aggregated or waiting for a worker.", lambda: portfolio_pool.in_flight)
+REGISTRY.callback(
+    "ai_catalog_version", "Version of the loaded intent and card catalogs (0 before first use).",
+    lambda: catalog.status().get("version", 0),
+)
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/debug/profile")
+def debug_profile(reset: bool = False, x_admin_token: Optional[str] = Header(None)):
+    # Collapsed stacks for flamegraph.pl / speedscope; needs AI_PROFILE_INTERVAL_MS
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if not profiler.enabled:
+        return JSONResponse(content={"error": "Set AI_PROFILE_INTERVAL_MS to enable profiling.", **profiler.status()}, status_code=404)
+    return Response(content=profiler.collapsed(reset=reset), media_type="text/plain")
+
 # Suggestion API based on balance
 class BalanceQuery(BaseModel):
     balance: float
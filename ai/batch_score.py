@@ -0,0 +1,310 @@
+"""Score transaction files offline: PFM insights and card recommendations per customer.
+
+Run from the ai/ directory:
+
+    python batch_score.py exports/*.jsonl --out results/ --customer-key AccountId
+
+Inputs are JSONL (one transaction per line) or Parquet (one transaction per
+row; needs pyarrow) and must be grouped by customer: all of a customer's
+transactions in one file, on consecutive rows. Each file is cut into tasks of
+about --chunk-mb (JSONL) or one row group (Parquet). A customer belongs to the
+task its first transaction falls in, and that task reads on past its end until
+the customer changes, so tasks never share a customer. Tasks run in a process
+pool and each writes one part file to --out, with the same insights as
+/pfm-insights and the same recommendations as /credit-card-recommendations.
+
+--out/_checkpoint.json records the finished tasks. Running the same command
+again after an interruption only runs the rest; pass --restart to start over.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+import pandas as pd
+
+from cards import CardEngine, spending_summary
+from catalog import CARD_LISTING_FILE, CARDS_FILE
+from categorize import CATEGORIES_FILE, MerchantClassifier
+from ingest import load_transactions
+from insights import accumulate_by, compact_insights
+
+CHECKPOINT = "_checkpoint.json"
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+BREAKDOWN_FIELDS = ["monthly_spending_trend", "top_spending_merchants", "spending_by_payment_mode",
+                    "transaction_type_breakdown"]
+_NO_KEY = object()  # "no previous customer", distinct from a missing (None) key
+
+_classifier = None
+_cards = None
+
+
+class Task(NamedTuple):
+    path: str
+    format: str  # "jsonl" or "parquet"
+    start: int  # byte offset (JSONL) or row group (Parquet)
+    end: int
+
+
+def _parquet():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        sys.exit("Parquet files need pyarrow: pip install pyarrow")
+    return pyarrow.parquet
+
+
+def input_files(paths):
+    files = []
+    for path in paths:
+        found = sorted(glob.glob(os.path.join(path, "*"))) if os.path.isdir(path) else [path]
+        files.extend(f for f in found if os.path.splitext(f)[1] in FORMATS)
+    if not files:
+        sys.exit("No .jsonl, .ndjson or .parquet files found")
+    return files
+
+
+def plan_tasks(files, chunk_bytes):
+    """Cut each file into tasks: JSONL at line starts about chunk_bytes apart, Parquet by row group."""
+    tasks = []
+    for path in files:
+        if FORMATS[os.path.splitext(path)[1]] == "parquet":
+            groups = _parquet().ParquetFile(path).num_row_groups
+            tasks.extend(Task(path, "parquet", g, g + 1) for g in range(groups))
+            continue
+        size = os.path.getsize(path)
+        starts = [0]
+        with open(path, "rb") as f:
+            while starts[-1] + chunk_bytes < size:
+                f.seek(starts[-1] + chunk_bytes)
+                f.readline()
+                if f.tell() >= size:
+                    break
+                starts.append(f.tell())
+        tasks.extend(Task(path, "jsonl", start, end) for start, end in zip(starts, starts[1:] + [size]))
+    return tasks
+
+
+def _line_before(f, offset):
+    """The last non-blank line before ``offset``, which is the start of a line."""
+    data, end = b"", offset
+    while end > 0:
+        begin = max(0, end - (1 << 16))
+        f.seek(begin)
+        data = f.read(end - begin) + data
+        head, _, line = data.rstrip().rpartition(b"\n")
+        if head or begin == 0:
+            return line
+        end = begin
+    return b""
+
+
+def _jsonl_previous(task, key):
+    if not task.start:
+        return _NO_KEY
+    with open(task.path, "rb") as f:
+        line = _line_before(f, task.start)
+    return json.loads(line).get(key) if line.strip() else _NO_KEY
+
+
+def _jsonl_rows(task):
+    with open(task.path, "rb") as f:
+        f.seek(task.start)
+        position = task.start
+        for line in f:
+            if line.strip():
+                yield position, json.loads(line)
+            position += len(line)
+
+
+def _parquet_previous(task, key):
+    if not task.start:
+        return _NO_KEY
+    keys = _parquet().ParquetFile(task.path).read_row_group(task.start - 1, columns=[key]).column(key)
+    return keys[len(keys) - 1].as_py() if len(keys) else _NO_KEY
+
+
+def _parquet_rows(task):
+    pf = _parquet().ParquetFile(task.path)
+    for group in range(task.start, pf.num_row_groups):
+        for row in pf.read_row_group(group).to_pylist():
+            yield group, row
+
+
+def owned_transactions(task, key):
+    """The transactions of the customers whose first transaction falls inside ``task``."""
+    if task.format == "parquet":
+        previous, rows = _parquet_previous(task, key), _parquet_rows(task)
+    else:
+        previous, rows = _jsonl_previous(task, key), _jsonl_rows(task)
+    owned, current = [], _NO_KEY
+    for position, transaction in rows:
+        customer = transaction.get(key)
+        if position >= task.end and (not owned or customer != current):
+            break
+        if not owned and customer == previous:
+            continue  # the previous task's last customer
+        owned.append(transaction)
+        current = customer
+    rows.close()
+    return owned
+
+
+def _init_worker(categories_file, cards_file, card_listing_file):
+    global _classifier, _cards
+    _classifier = MerchantClassifier.from_csv(categories_file)
+    _cards = CardEngine.from_files(cards_file, card_listing_file)
+
+
+def score_transactions(transactions, key, top_n=5, classifier=None, cards=None):
+    """One result per customer in ``transactions``: insights plus card recommendations."""
+    classifier, cards = classifier or _classifier, cards or _cards
+    df = load_transactions(transactions)
+    if key not in df.columns:
+        df[key] = pd.Series([t.get(key) for t in transactions], dtype=object)
+    accumulators = accumulate_by(df, key, classifier)
+    customers = [(accumulator.total_spent, accumulator.category_spend) for accumulator in accumulators.values()]
+    recommendations = cards.recommend_many(customers)
+    results = []
+    for (customer, accumulator), spend, picked in zip(accumulators.items(), customers, recommendations):
+        insights = compact_insights(accumulator.insights(top_n=top_n))
+        for field in BREAKDOWN_FIELDS:
+            insights.setdefault(field, {})  # as PFMInsights fills them in for /pfm-insights
+        results.append({
+            key: customer,
+            "insights": insights,
+            "recommendations": {"spending_summary": spending_summary(*spend), "recommendations": picked},
+        })
+    return results
+
+
+def _parquet_record(result, key):
+    # Parquet gets flat columns; the per-label breakdowns and the cards are JSON text
+    record = {key: result[key]}
+    for field, value in result["insights"].items():
+        record[field] = json.dumps(value) if field in BREAKDOWN_FIELDS else value
+    summary = dict(result["recommendations"]["spending_summary"])
+    del summary["total_spent"]  # the same as abs(insights total_spent)
+    record.update(summary)
+    cards = result["recommendations"]["recommendations"]
+    record["recommended_cards"] = [card["name"] for card in cards]
+    record["recommendations"] = json.dumps(cards)
+    return record
+
+
+def write_part(path, results, key, fmt):
+    temporary = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow
+
+        table = pyarrow.Table.from_pylist([_parquet_record(result, key) for result in results])
+        _parquet().write_table(table, temporary)
+    else:
+        with open(temporary, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+    os.replace(temporary, path)
+
+
+def run_task(index, task, args):
+    """Score one task into its part file; returns (index, customers, transactions)."""
+    transactions = owned_transactions(task, args.customer_key)
+    results = score_transactions(transactions, args.customer_key, args.top_n) if transactions else []
+    write_part(os.path.join(args.out, f"part-{index:05d}.{args.format}"), results, args.customer_key, args.format)
+    return index, len(results), len(transactions)
+
+
+def load_checkpoint(args, files, tasks):
+    """The checkpoint for this run, resumed from --out when it was written by the same command."""
+    fingerprint = {
+        "inputs": [[path, os.stat(path).st_size, os.stat(path).st_mtime_ns] for path in files],
+        "params": {"customer_key": args.customer_key, "chunk_mb": args.chunk_mb, "format": args.format,
+                   "top_n": args.top_n},
+        "tasks": len(tasks),
+    }
+    path = os.path.join(args.out, CHECKPOINT)
+    if os.path.exists(path) and not args.restart:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if {k: checkpoint.get(k) for k in fingerprint} != fingerprint:
+            sys.exit(f"{path} is from a different run (inputs or options changed); pass --restart to start over")
+        return checkpoint
+    for part in glob.glob(os.path.join(args.out, "part-*")):
+        os.remove(part)
+    return {**fingerprint, "done": [], "customers": 0, "transactions": 0}
+
+
+def save_checkpoint(args, checkpoint):
+    path = os.path.join(args.out, CHECKPOINT)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="JSONL/Parquet files, or directories of them")
+    parser.add_argument("--out", required=True, help="output directory for part files and the checkpoint")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="part file format")
+    parser.add_argument("--customer-key", default="AccountId", help="transaction field identifying the customer")
+    parser.add_argument("--top-n", type=int, default=5, help="top merchants per customer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-mb", type=float, default=16, help="JSONL bytes per task")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+    if args.format == "parquet":
+        _parquet()
+
+    os.makedirs(args.out, exist_ok=True)
+    files = input_files(args.inputs)
+    tasks = plan_tasks(files, int(args.chunk_mb * 2**20))
+    checkpoint = load_checkpoint(args, files, tasks)
+    done = set(checkpoint["done"])
+    pending = [(i, task) for i, task in enumerate(tasks) if i not in done]
+    print(f"{len(tasks)} tasks from {len(files)} files, {len(done)} already done", flush=True)
+
+    started = time.perf_counter()
+    customers = 0
+    initargs = (CATEGORIES_FILE, CARDS_FILE, CARD_LISTING_FILE)
+
+    def finished(index, task_customers, task_transactions):
+        nonlocal customers
+        customers += task_customers
+        checkpoint["done"].append(index)
+        checkpoint["customers"] += task_customers
+        checkpoint["transactions"] += task_transactions
+        save_checkpoint(args, checkpoint)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{len(checkpoint['done'])}/{len(tasks)} tasks, {checkpoint['customers']} customers "
+            f"({customers / elapsed * 3600:,.0f}/hour)",
+            flush=True,
+        )
+
+    if args.workers < 2 or len(pending) < 2:
+        _init_worker(*initargs)
+        for index, task in pending:
+            finished(*run_task(index, task, args))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=initargs,
+        ) as executor:
+            futures = [executor.submit(run_task, index, task, args) for index, task in pending]
+            for future in as_completed(futures):
+                finished(*future.result())
+    print(
+        f"Scored {checkpoint['customers']} customers ({checkpoint['transactions']} transactions) "
+        f"into {args.out} in {time.perf_counter() - started:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
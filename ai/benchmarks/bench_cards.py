@@ -0,0 +1,118 @@
+"""Card scoring cost per customer: legacy if-chain vs cards.CardEngine, one at a time and batched.
+
+The legacy path only knows the original eight cards; the engine scores every
+card in cards.json. Run from the ai/ directory:
+
+    python -m benchmarks.bench_cards --customers 1 100 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks import results
+from cards import CardEngine, parse_card_listing
+from catalog import CARD_LISTING_FILE, CARDS_FILE
+
+CATEGORIES = ["travel", "food", "grocery", "entertainment", "shopping", "bills", "transport"]
+
+
+def legacy_score_cards(cards, total_spent, category_spend):
+    # The pre-cards.py scoring from app.py, kept here for comparison
+    travel_spend = category_spend.get("travel", 0.0)
+    food_spend = category_spend.get("food", 0.0)
+    grocery_spend = category_spend.get("grocery", 0.0)
+    entertainment_spend = category_spend.get("entertainment", 0.0)
+    scored_cards = []
+
+    def add_card(score, category, savings=0.0, spend=0.0):
+        card = cards[category]
+        values = {"spend": spend, "score": score, "total_spent": total_spent, "savings": savings}
+        scored_cards.append({"score": score, "card": {
+            "name": card["name"],
+            "reason": card["reason"].format(**values),
+            "benefits": list(card["benefits"]),
+            "apply_url": card["apply_url"],
+            "potential_savings": card["potential_savings"].format(**values),
+            "category": category,
+        }})
+
+    if travel_spend > 0:
+        add_card(travel_spend / max(total_spent, 1) * 100, "travel", savings=travel_spend * 0.10, spend=travel_spend)
+    if food_spend > 0:
+        add_card(food_spend / max(total_spent, 1) * 100, "dining", savings=food_spend * 0.35, spend=food_spend)
+    if grocery_spend > 0:
+        add_card(grocery_spend / max(total_spent, 1) * 100, "grocery", savings=grocery_spend * 8, spend=grocery_spend)
+    if entertainment_spend > 0:
+        add_card(entertainment_spend / max(total_spent, 1) * 100, "entertainment",
+                 savings=entertainment_spend * 2, spend=entertainment_spend)
+    if total_spent > 1000:
+        add_card(50, "cashback", savings=min(total_spent * 0.06, 1000))
+    if total_spent > 5000:
+        add_card(60, "premium", savings=total_spent * 0.08)
+    if total_spent < 1000:
+        add_card(80, "basic", savings=total_spent * 0.01)
+    add_card(30, "islamic")
+    scored_cards.sort(key=lambda x: x["score"], reverse=True)
+
+    recommendations, seen_categories = [], set()
+    for item in scored_cards:
+        if len(recommendations) >= 4:
+            break
+        if item["card"]["category"] not in seen_categories:
+            recommendations.append(item["card"])
+            seen_categories.add(item["card"]["category"])
+    for rec in recommendations:
+        rec.pop("category", None)
+    return recommendations
+
+
+def generate_customers(n, seed=0):
+    """(total_spent, {category: spend}) pairs with a few categories each."""
+    rng = random.Random(seed)
+    customers = []
+    for _ in range(n):
+        spend = {c: round(rng.uniform(0, 4000), 2) for c in rng.sample(CATEGORIES, rng.randint(0, len(CATEGORIES)))}
+        customers.append((sum(spend.values()) + round(rng.uniform(0, 3000), 2), spend))
+    return customers
+
+
+def us_per_customer(fn, customers, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(customers)
+        best = min(best, time.perf_counter() - started)
+    return best / len(customers) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    with open(CARDS_FILE, "r", encoding="utf-8") as f:
+        definitions = json.load(f)
+    with open(CARD_LISTING_FILE, "r", encoding="utf-8") as f:
+        listing = parse_card_listing(f.read())
+    legacy_cards = {d["category"]: d for d in definitions}
+    engine = CardEngine(definitions, listing)
+
+    rows = []
+    print(f"{len(engine)} cards, {len(engine.features)} spend features")
+    print(f"{'customers':>10} {'legacy us':>10} {'engine us':>10} {'batched us':>11}")
+    for n in args.customers:
+        customers = generate_customers(n)
+        legacy = us_per_customer(lambda cs: [legacy_score_cards(legacy_cards, *c) for c in cs], customers, args.repeat)
+        single = us_per_customer(lambda cs: [engine.recommend(*c) for c in cs], customers, args.repeat)
+        batched = us_per_customer(engine.recommend_many, customers, args.repeat)
+        rows.append({"customers": n, "legacy_us": legacy, "engine_us": single, "batched_us": batched})
+        print(f"{n:>10} {legacy:>10.1f} {single:>10.1f} {batched:>11.1f}")
+    if args.json:
+        results.save(args.json, "cards", rows, cards=len(engine), repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Rows/sec of transaction ingestion: legacy json_normalize path vs ingest.load_transactions.
+
+Run from the ai/ directory:
+
+    python -m benchmarks.bench_ingest --sizes 1000 100000 1000000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks import results
+from benchmarks.synthetic import generate_transactions
+from ingest import load_transactions
+
+
+def legacy_ingest(transactions):
+    # The pre-ingest.py code path from app.py, kept here for comparison
+    df = pd.json_normalize(transactions)
+    df["TransactionDateTime"] = pd.to_datetime(df["TransactionDateTime"], errors="coerce")
+    if "Amount.Amount" in df.columns:
+        df["Amount.Amount"] = pd.to_numeric(df["Amount.Amount"], errors="coerce")
+    elif "Amount" in df.columns:
+        df["Amount.Amount"] = pd.to_numeric(df["Amount"].apply(lambda x: x.get("Amount") if isinstance(x, dict) else None), errors="coerce")
+    df["SignedAmount"] = df.apply(
+        lambda x: x["Amount.Amount"] if str(x.get("CreditDebitIndicator", "")).lower() == "credit"
+        else -x["Amount.Amount"], axis=1
+    )
+    return df
+
+
+def rows_per_sec(fn, transactions, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(transactions)
+        best = min(best, time.perf_counter() - started)
+    return len(transactions) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time load_transactions")
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'columnar rows/s':>16} {'speedup':>8}")
+    for size in args.sizes:
+        transactions = generate_transactions(size)
+        new = rows_per_sec(load_transactions, transactions, args.repeat)
+        if args.skip_legacy:
+            rows.append({"rows": size, "columnar_rows_per_sec": new})
+            print(f"{size:>10} {'-':>15} {new:>16,.0f} {'-':>8}")
+            continue
+        old = rows_per_sec(legacy_ingest, transactions, 1 if size >= 100_000 else args.repeat)
+        rows.append({"rows": size, "legacy_rows_per_sec": old, "columnar_rows_per_sec": new})
+        print(f"{size:>10} {old:>15,.0f} {new:>16,.0f} {new / old:>7.1f}x")
+    if args.json:
+        results.save(args.json, "ingest", rows, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
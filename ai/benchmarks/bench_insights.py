@@ -0,0 +1,54 @@
+"""Cost of the PFM pipeline stages: ingest, aggregate (/pfm-insights) and render (dashboard).
+
+Run from the ai/ directory:
+
+    python -m benchmarks.bench_insights --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+from benchmarks import results
+from benchmarks.synthetic import generate_transactions
+from ingest import load_transactions
+from insights import compact_insights, compute_insights
+from render import render_dashboard
+
+
+def best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-render", action="store_true", help="do not time the matplotlib render")
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'rows':>10} {'ingest ms':>10} {'aggregate ms':>13} {'render ms':>10}")
+    for size in args.sizes:
+        transactions = generate_transactions(size, accounts=4)
+        df = load_transactions(transactions)
+        ingest_ms = best_ms(lambda: load_transactions(transactions), args.repeat)
+        aggregate_ms = best_ms(lambda: compact_insights(compute_insights(df)), args.repeat)
+        row = {"rows": size, "ingest_ms": ingest_ms, "aggregate_ms": aggregate_ms}
+        render_ms = "-"
+        if not args.skip_render:
+            insights = compute_insights(df)
+            row["render_ms"] = best_ms(lambda: render_dashboard(insights), args.repeat)
+            render_ms = f"{row['render_ms']:.1f}"
+        rows.append(row)
+        print(f"{size:>10} {ingest_ms:>10.1f} {aggregate_ms:>13.1f} {render_ms:>10}")
+    if args.json:
+        results.save(args.json, "insights", rows, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""In-process load test of the AI service: throughput and p50/p95/p99 latency per endpoint.
+
+Requests go through httpx's ASGI transport straight into the FastAPI app, so
+there is no network or uvicorn in the measurement; the app's lifespan runs as
+it would in a worker (render pool warm-up included). The result cache is
+disabled unless --cache is given, so every request does the full work. Run
+from the ai/ directory:
+
+    python -m benchmarks.bench_load --concurrency 1 16 64 --json load.json
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks import results
+from benchmarks.synthetic import generate_queries, generate_transactions
+
+
+def scenarios(rows, variants):
+    """Request factories per endpoint: name -> (method, path, kwargs for request i)."""
+    histories = [generate_transactions(rows, seed=seed, accounts=2, days=540) for seed in range(variants)]
+    queries = generate_queries(256)
+    return {
+        "predict": ("POST", "/predict", lambda i: {"json": {"description": queries[i % len(queries)]}}),
+        "predict-batch": ("POST", "/predict/batch", lambda i: {"json": {"descriptions": queries, "top_k": 3}}),
+        "credit-card-recommendations": (
+            "POST", "/credit-card-recommendations", lambda i: {"json": {"transactions": histories[i % variants]}}
+        ),
+        "pfm-insights": ("POST", "/pfm-insights", lambda i: {"json": {"transactions": histories[i % variants]}}),
+        "pfm-dashboard-image": (
+            "POST", "/pfm-dashboard-image", lambda i: {"json": histories[i % variants], "headers": {"Accept": "image/png"}}
+        ),
+    }
+
+
+async def drive(client, method, path, make_request, concurrency, total):
+    """Run ``total`` requests from ``concurrency`` clients; returns (latencies in s, errors, elapsed s)."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await client.request(method, path, **make_request(i))
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run(args):
+    import httpx
+
+    import app as service
+
+    if not args.cache:
+        service.result_cache.max_entries = 0
+    selected = scenarios(args.rows, args.variants)
+    if args.endpoints:
+        selected = {name: selected[name] for name in args.endpoints}
+    rows = []
+    async with service.app.router.lifespan_context(service.app):
+        await service.render_pool.warm()
+        transport = httpx.ASGITransport(app=service.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, (method, path, make_request) in selected.items():
+                await drive(client, method, path, make_request, 1, args.warmup)
+                for concurrency in args.concurrency:
+                    total = max(args.requests, concurrency)
+                    latencies, errors, elapsed = await drive(client, method, path, make_request, concurrency, total)
+                    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+                    rows.append({
+                        "endpoint": name,
+                        "concurrency": concurrency,
+                        "requests": total,
+                        "error_rate": errors / total,
+                        "requests_per_sec": total / elapsed,
+                        "p50_ms": float(p50),
+                        "p95_ms": float(p95),
+                        "p99_ms": float(p99),
+                    })
+                    r = rows[-1]
+                    print(
+                        f"{name:<28} {concurrency:>5} {total:>6} {errors:>6} {r['requests_per_sec']:>9.1f} "
+                        f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}",
+                        flush=True,
+                    )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--rows", type=int, default=2_000, help="transactions per request body")
+    parser.add_argument("--variants", type=int, default=8, help="distinct transaction histories to cycle through")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--endpoints", nargs="+", help="only these scenarios")
+    parser.add_argument("--cache", action="store_true", help="leave the result cache on")
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<28} {'conc':>5} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = asyncio.run(run(args))
+    if args.json:
+        results.save(
+            args.json, "load", rows,
+            concurrency=args.concurrency, requests=args.requests, rows=args.rows, cache=args.cache,
+        )
+
+
+if __name__ == "__main__":
+    main()
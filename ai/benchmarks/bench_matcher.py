@@ -0,0 +1,160 @@
+"""Intent matcher recall and latency: word TF-IDF vs character n-grams, exact vs approximate search.
+
+The first table scores each matcher on the labeled queries in
+benchmarks/intent_queries.csv against end_points.csv ("none" marks queries
+that should get the not-ready answer). The second times exact and clustered
+(approximate) search on synthetic catalogs of thousands of intents, with
+recall measured against the exact top match. Run from the ai/ directory:
+
+    python -m benchmarks.bench_matcher --sizes 1000 10000 50000 --json matcher.json
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import results
+from catalog import INTENTS_FILE, fit_intent_index
+from matcher import BACKENDS, IntentMatcher, VectorIndex, intent_texts
+
+LABELED_QUERIES = "benchmarks/intent_queries.csv"
+
+VERBS = ["view", "check", "pay", "open", "close", "manage", "update", "download", "transfer", "apply for",
+         "cancel", "report", "track", "compare", "renew", "activate", "block", "dispute", "schedule", "request"]
+OBJECTS = ["savings account", "current account", "credit card", "debit card", "personal loan", "car loan",
+           "mortgage", "fixed deposit", "standing order", "direct debit", "beneficiary", "statement", "cheque book",
+           "travel insurance", "home insurance", "bill payment", "salary transfer", "remittance", "investment fund",
+           "gold account", "prepaid card", "overdraft", "covered card", "reward points", "utility bill",
+           "school fees", "mobile recharge", "forex order", "wealth plan", "business account"]
+QUALIFIERS = ["online", "in dirhams", "abroad", "for my family", "this month", "instantly", "with cashback",
+              "without fees", "for students", "for my business", "with miles", "islamic", "joint", "premium",
+              "monthly", "on mobile", "at a branch", "before the due date", "in installments", "securely"]
+
+
+def synthetic_catalog(n, seed=0):
+    """``n`` distinct intent descriptions and one perturbed query per intent."""
+    rng = random.Random(seed)
+    descriptions = []
+    for i in range(n):
+        words = [rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(QUALIFIERS), rng.choice(QUALIFIERS)]
+        descriptions.append(" ".join(words) + f" plan {i}")
+    queries = []
+    for description in descriptions:
+        words = description.split()
+        del words[rng.randrange(len(words) - 2)]  # drop a word, keeping the plan number
+        word = rng.randrange(len(words) - 2)
+        if len(words[word]) > 3:  # and misspell another
+            cut = rng.randrange(1, len(words[word]) - 1)
+            words[word] = words[word][:cut] + words[word][cut + 1:]
+        queries.append(" ".join(words))
+    return descriptions, queries
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def labeled(matcher_names, repeat):
+    intents = pd.read_csv(INTENTS_FILE)
+    texts, labels = intent_texts(intents)
+    routes = intents["route"].tolist()
+    queries = pd.read_csv(LABELED_QUERIES)
+    in_scope = (queries["route"] != "none").to_numpy()
+    for name in matcher_names:
+        vectorizer, index = fit_intent_index(texts, name)
+        matcher = IntentMatcher(name, vectorizer, index, labels)
+        found = matcher.search(queries["query"].tolist(), k=3)
+        top_routes = [[routes[i] for i in indices] for indices, _ in found]
+        best_scores = np.array([scores[0] for _, scores in found])
+        answers = np.where(best_scores >= matcher.min_score, [r[0] for r in top_routes], "none")
+        correct = answers == queries["route"].to_numpy()
+        recall_3 = np.mean([route in r for route, r in zip(queries["route"][in_scope], np.array(top_routes, dtype=object)[in_scope])])
+        uncached, cached = [], []
+        for text in queries["query"].tolist() * repeat:
+            started = time.perf_counter()
+            matcher.search([text])
+            uncached.append(time.perf_counter() - started)
+            matcher.match(text)
+            started = time.perf_counter()
+            matcher.match(text)
+            cached.append(time.perf_counter() - started)
+        yield {
+            "matcher": name,
+            "queries": len(queries),
+            "accuracy": float(correct.mean()),
+            "in_scope_recall_1": float(correct[in_scope].mean()),
+            "in_scope_recall_3": float(recall_3),
+            "out_of_scope_rejected": float(correct[~in_scope].mean()),
+            "p50_ms": percentile_ms(uncached, 50),
+            "cached_p50_ms": percentile_ms(cached, 50),
+        }
+
+
+def scaled(name, sizes, probes, sample):
+    for size in sizes:
+        descriptions, queries = synthetic_catalog(size)
+        picked = random.Random(1).sample(range(size), min(sample, size))
+        queries = [queries[i] for i in picked]
+        vectorizer, index = fit_intent_index(descriptions, name)
+        query_vec = vectorizer.transform(queries)
+        exact = VectorIndex(index, np.arange(size), ann_min_rows=size + 1)
+        truth = np.array([indices[0] for indices, _ in exact.search(query_vec)])
+        started = time.perf_counter()
+        clustered = VectorIndex(index, np.arange(size), ann_min_rows=0, probes=probes)
+        build_ms = (time.perf_counter() - started) * 1000
+        for search, kind in ((exact, "exact"), (clustered, "clustered")):
+            latencies, top = [], []
+            for i in range(query_vec.shape[0]):
+                started = time.perf_counter()
+                indices, _ = search.search(query_vec[i])[0]
+                latencies.append(time.perf_counter() - started)
+                top.append(indices[0])
+            top = np.array(top)
+            yield {
+                "matcher": name,
+                "intents": size,
+                "search": kind,
+                "recall_vs_exact": float(np.mean(top == truth)),
+                "accuracy": float(np.mean(top == np.array(picked))),
+                "p50_ms": percentile_ms(latencies, 50),
+                "p99_ms": percentile_ms(latencies, 99),
+                "build_ms": build_ms if kind == "clustered" else 0.0,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matchers", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--probes", type=int, default=8, help="clusters searched per query")
+    parser.add_argument("--sample", type=int, default=500, help="synthetic queries per catalog size")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'matcher':<10} {'accuracy':>9} {'recall@1':>9} {'recall@3':>9} {'rejected':>9} {'p50 ms':>8} {'cached':>8}")
+    for row in labeled(args.matchers, args.repeat):
+        rows.append(row)
+        print(
+            f"{row['matcher']:<10} {row['accuracy']:>9.1%} {row['in_scope_recall_1']:>9.1%} "
+            f"{row['in_scope_recall_3']:>9.1%} {row['out_of_scope_rejected']:>9.1%} "
+            f"{row['p50_ms']:>8.3f} {row['cached_p50_ms']:>8.4f}"
+        )
+    print(f"\n{'matcher':<10} {'intents':>8} {'search':<10} {'recall':>7} {'accuracy':>9} {'p50 ms':>8} {'p99 ms':>8} {'build ms':>9}")
+    for name in args.matchers:
+        for row in scaled(name, args.sizes, args.probes, args.sample):
+            rows.append(row)
+            print(
+                f"{name:<10} {row['intents']:>8} {row['search']:<10} {row['recall_vs_exact']:>7.1%} "
+                f"{row['accuracy']:>9.1%} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['build_ms']:>9.0f}",
+                flush=True,
+            )
+    if args.json:
+        results.save(args.json, "matcher", rows, sizes=args.sizes, probes=args.probes, sample=args.sample)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Portfolio aggregation: one merged payload vs per-account partials in a worker pool.
+
+Run from the ai/ directory (the pool only helps with more than one CPU):
+
+    python -m benchmarks.bench_portfolio --accounts 50000 20000 20000 5000 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks import results
+from benchmarks.synthetic import generate_transactions
+from categorize import MerchantClassifier
+from ingest import load_transactions
+from insights import InsightsAccumulator, compute_insights
+from portfolio import PortfolioPool
+
+
+def best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def merged(transactions, classifier):
+    df = load_transactions(transactions)
+    return compute_insights(df), classifier.spend_by_category(df)
+
+
+async def pooled(pool, accounts, repeat):
+    await pool.warm()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        partials, _ = await pool.partials(accounts)
+        consolidated = InsightsAccumulator(pool.classifier)
+        for partial in partials.values():
+            consolidated.merge(partial)
+        consolidated.insights()
+        best = min(best, time.perf_counter() - started)
+    pool.shutdown()
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, nargs="+", default=[50_000, 20_000, 20_000, 5_000],
+                        help="transactions per account")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    classifier = MerchantClassifier.from_csv()
+    accounts = {f"ACC{i:04d}": generate_transactions(n, seed=i) for i, n in enumerate(args.accounts)}
+    flat = [t for transactions in accounts.values() for t in transactions]
+    largest = max(accounts.values(), key=len)
+
+    inline = PortfolioPool(classifier, workers=1)
+    pool = PortfolioPool(classifier, workers=args.workers, inline_rows=0)
+    paths = [
+        ("merged payload", lambda: best_ms(lambda: merged(flat, classifier), args.repeat)),
+        ("largest account alone", lambda: best_ms(lambda: merged(largest, classifier), args.repeat)),
+        ("partials in one thread", lambda: asyncio.run(pooled(inline, accounts, args.repeat))),
+        (f"partials in {args.workers} processes", lambda: asyncio.run(pooled(pool, accounts, args.repeat))),
+    ]
+
+    rows = []
+    print(f"{len(flat)} transactions in {len(accounts)} accounts, {os.cpu_count()} CPUs")
+    for path, measure in paths:
+        rows.append({"path": path, "ms": measure()})
+        print(f"  {path:<32} {rows[-1]['ms']:>9.1f} ms")
+    if args.json:
+        results.save(args.json, "portfolio", rows, accounts=args.accounts, workers=args.workers, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
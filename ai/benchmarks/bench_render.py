@@ -0,0 +1,116 @@
+"""Dashboard renders per second: a new figure per render vs the warm render.DashboardTemplate.
+
+Both paths run in this process, one render at a time, cycling through
+dashboards built from different synthetic histories. The "partial" workload
+blanks one or more panels per dashboard so the "No Data" variants are hit too.
+Run from the ai/ directory:
+
+    python -m benchmarks.bench_render --formats png svg --json render.json
+"""
+import argparse
+import random
+import statistics
+import time
+from io import BytesIO
+
+from benchmarks import results
+from benchmarks.synthetic import generate_transactions
+from ingest import load_transactions
+from insights import compact_insights, compute_insights
+from render import CHARTS, _has_data, render_dashboard
+
+
+def legacy_draw_panel(ax, series, title, ylabel, xlabel, color):
+    ax.set_title(title)
+    if not _has_data(series):
+        ax.text(0.5, 0.5, "No Data", ha="center", va="center")
+        ax.axis("off")
+        return
+    labels = list(series.keys())
+    ax.bar(range(len(labels)), list(series.values()), width=0.5, color=color)
+    ax.set_xticks(range(len(labels)), [str(label) for label in labels])
+    ax.set_xlim(-0.5, len(labels) - 0.5)
+    ax.set_ylabel(ylabel)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    ax.tick_params(axis="x", rotation=45)
+
+
+def legacy_render_dashboard(insights, fmt="png", dpi=100, figsize=(14, 8)):
+    # The pre-template render from render.py, kept here for comparison
+    from matplotlib.figure import Figure
+
+    started = time.perf_counter()
+    fig = Figure(figsize=figsize, dpi=dpi)
+    axs = fig.subplots(2, 2)
+    for ax, (key, title, ylabel, xlabel, color) in zip(axs.flat, CHARTS):
+        legacy_draw_panel(ax, insights.get(key), title, ylabel, xlabel, color)
+    fig.tight_layout()
+    plotted = time.perf_counter()
+    buf = BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi)
+    return buf.getvalue(), {
+        "plot": (plotted - started) * 1000,
+        "encode": (time.perf_counter() - plotted) * 1000,
+    }
+
+
+def dashboards(n, transactions, partial):
+    rng = random.Random(n)
+    boards = []
+    for seed in range(n):
+        insights = compact_insights(compute_insights(load_transactions(generate_transactions(transactions, seed=seed))))
+        if partial:
+            for key, *_ in rng.sample(CHARTS, rng.randint(1, len(CHARTS))):
+                insights[key] = {}
+        boards.append(insights)
+    return boards
+
+
+def measure(render, boards, fmt, renders):
+    render(boards[0], fmt)  # warm-up: imports, fonts, and the template for this size
+    plot, encode = [], []
+    started = time.perf_counter()
+    for i in range(renders):
+        _, timings = render(boards[i % len(boards)], fmt)
+        plot.append(timings["plot"])
+        encode.append(timings["encode"])
+    elapsed = time.perf_counter() - started
+    return {
+        "renders_per_sec": renders / elapsed,
+        "plot_ms": statistics.median(plot),
+        "encode_ms": statistics.median(encode),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--formats", nargs="+", choices=["png", "svg", "webp"], default=["png", "svg"])
+    parser.add_argument("--dashboards", type=int, default=8, help="distinct dashboards cycled through")
+    parser.add_argument("--transactions", type=int, default=2_000, help="transactions per dashboard history")
+    parser.add_argument("--renders", type=int, default=20, help="renders timed per path")
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+    import matplotlib
+    matplotlib.use("Agg")
+
+    rows = []
+    print(f"{'workload':<9} {'format':<6} {'path':<9} {'renders/s':>10} {'plot ms':>8} {'encode ms':>10}")
+    for workload in ("full", "partial"):
+        boards = dashboards(args.dashboards, args.transactions, workload == "partial")
+        for fmt in args.formats:
+            for path, render in (("legacy", legacy_render_dashboard), ("template", render_dashboard)):
+                row = {"workload": workload, "format": fmt, "path": path, **measure(render, boards, fmt, args.renders)}
+                rows.append(row)
+                print(
+                    f"{workload:<9} {fmt:<6} {path:<9} {row['renders_per_sec']:>10.2f} "
+                    f"{row['plot_ms']:>8.1f} {row['encode_ms']:>10.1f}",
+                    flush=True,
+                )
+    if args.json:
+        results.save(args.json, "render", rows, dashboards=args.dashboards, transactions=args.transactions,
+                     renders=args.renders)
+
+
+if __name__ == "__main__":
+    main()
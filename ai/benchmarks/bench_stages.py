@@ -0,0 +1,104 @@
+"""Micro-benchmarks for each stage of the /pfm-dashboard-image, /credit-card-recommendations and /predict pipelines.
+
+The stages match the ai_stage_duration_seconds labels on /metrics. Run from the
+ai/ directory:
+
+    python -m benchmarks.bench_stages --sizes 1000 10000 --json stages.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks import results
+from benchmarks.synthetic import generate_queries, generate_transactions
+from categorize import MerchantClassifier
+from ingest import load_transactions
+from insights import compute_insights
+from render import render_dashboard
+
+
+def timed(fn, repeat):
+    """(best ms, median ms, last result) over ``repeat`` calls."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times), statistics.median(times), result
+
+
+def row(pipeline, stage, rows, best_ms, median_ms):
+    return {"pipeline": pipeline, "stage": stage, "rows": rows, "best_ms": best_ms, "median_ms": median_ms}
+
+
+def dashboard_stages(transactions, repeat, render_repeat):
+    n = len(transactions)
+    body = json.dumps(transactions)
+    best, median, _ = timed(lambda: json.loads(body), repeat)
+    yield row("dashboard", "parse", n, best, median)
+    best, median, df = timed(lambda: load_transactions(transactions), repeat)
+    yield row("dashboard", "normalize", n, best, median)
+    best, median, insights = timed(lambda: compute_insights(df), repeat)
+    yield row("dashboard", "aggregate", n, best, median)
+    if render_repeat:
+        # render_dashboard reports plot and encode separately
+        timings = [render_dashboard(insights)[1] for _ in range(render_repeat)]
+        for stage in ("plot", "encode"):
+            values = [t[stage] for t in timings]
+            yield row("dashboard", stage, n, min(values), statistics.median(values))
+
+
+def recommendation_stages(transactions, repeat, classifier, score_cards):
+    n = len(transactions)
+    best, median, df = timed(lambda: load_transactions(transactions), repeat)
+    yield row("recommendations", "parse", n, best, median)
+    classifier.classify.cache_clear()
+    cold = timed(lambda: classifier.spend_by_category(df), 1)[0]
+    best, median, category_spend = timed(lambda: classifier.spend_by_category(df), repeat)
+    yield row("recommendations", "categorize", n, best, median)
+    yield row("recommendations", "categorize_cold", n, cold, cold)
+    total_spent = abs(df[df["SignedAmount"] < 0]["SignedAmount"].sum())
+    best, median, _ = timed(lambda: score_cards(total_spent, category_spend), repeat)
+    yield row("recommendations", "score", n, best, median)
+
+
+def predict_stages(queries, repeat, snapshot):
+    n = len(queries)
+    best, median, query_vec = timed(lambda: snapshot.matcher.encode(queries), repeat)
+    yield row("predict", "vectorize", n, best, median)
+    best, median, _ = timed(lambda: snapshot.matcher.index.search(query_vec), repeat)
+    yield row("predict", "similarity", n, best, median)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, nargs="+", default=[1, 1_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--render-repeat", type=int, default=3, help="0 skips the matplotlib stages")
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+
+    # app owns the card scoring rules and the catalogs
+    from app import catalog, score_cards
+
+    classifier = MerchantClassifier.from_csv()
+    rows = []
+    for size in args.sizes:
+        transactions = generate_transactions(size, accounts=4, days=730)
+        rows.extend(dashboard_stages(transactions, args.repeat, args.render_repeat))
+        rows.extend(recommendation_stages(transactions, args.repeat, classifier, score_cards))
+    snapshot = catalog.snapshot
+    for n in args.queries:
+        rows.extend(predict_stages(generate_queries(n), args.repeat, snapshot))
+
+    print(f"{'pipeline':<16} {'stage':<16} {'rows':>8} {'best ms':>10} {'median ms':>10}")
+    for r in rows:
+        print(f"{r['pipeline']:<16} {r['stage']:<16} {r['rows']:>8} {r['best_ms']:>10.2f} {r['median_ms']:>10.2f}")
+    if args.json:
+        results.save(args.json, "stages", rows, sizes=args.sizes, queries=args.queries, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Cold-start cost of an AI service worker: import time, first requests and RSS.
+
+Each scenario runs in a fresh interpreter, the way a new uvicorn worker would.
+Run from the ai/ directory (after ``python build_index.py`` for the prebuilt
+scenario):
+
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import results
+
+PROBE = r"""
+import json, resource, sys, time
+def rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+started = time.perf_counter()
+import app
+result = {"import_ms": (time.perf_counter() - started) * 1000, "import_rss_mb": rss_mb()}
+started = time.perf_counter()
+app.suggestions(app.BalanceQuery(balance=250))
+result["first_suggestions_ms"] = (time.perf_counter() - started) * 1000
+result["sklearn_loaded_after_suggestions"] = "sklearn" in sys.modules
+started = time.perf_counter()
+app.predict(app.Query(description="check my account balance"))
+result["first_predict_ms"] = (time.perf_counter() - started) * 1000
+result["index_source"] = app.catalog.snapshot.index_source
+result["matplotlib_loaded"] = "matplotlib" in sys.modules
+result["rss_mb"] = rss_mb()
+sys.stdout.write("\nRESULT " + json.dumps(result) + "\n")
+"""
+
+SCENARIOS = {
+    "prebuilt index": {},
+    "fit at startup": {"AI_INTENT_INDEX": ""},
+}
+
+
+def run(env_overrides, cwd):
+    env = {**os.environ, **env_overrides}
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    line = [l for l in out.stdout.splitlines() if l.startswith("RESULT ")][-1]
+    return json.loads(line[len("RESULT "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    rows = []
+    for name, env in SCENARIOS.items():
+        runs = [run(env, cwd) for _ in range(args.repeat)]
+        best = {key: min(r[key] for r in runs) for key in runs[0] if isinstance(runs[0][key], float)}
+        rows.append({"scenario": name, **best})
+        print(f"{name} (best of {args.repeat}, index: {runs[0]['index_source']})")
+        for key, value in best.items():
+            print(f"  {key:<24} {value:>9.1f}")
+        print(f"  {'sklearn after /suggestions':<24} {runs[0]['sklearn_loaded_after_suggestions']!s:>9}")
+        print(f"  {'matplotlib in worker':<24} {runs[0]['matplotlib_loaded']!s:>9}")
+    if args.json:
+        results.save(args.json, "startup", rows, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Peak memory of buffered vs streamed ingestion of a large transaction upload.
+
+The body is written to a temporary NDJSON file first. The buffered path reads
+and decodes it whole, as /credit-card-recommendations does; the streamed path
+reads it in 64 KiB chunks through stream.transaction_batches, as the /stream
+endpoints do. Peak Python allocations are measured with tracemalloc. Run from
+the ai/ directory:
+
+    python -m benchmarks.bench_stream_memory --sizes 10000 100000 300000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import results
+from benchmarks.synthetic import generate_transactions
+from categorize import MerchantClassifier
+from ingest import load_transactions
+from insights import InsightsAccumulator, compute_insights
+from stream import STREAM_BATCH_SIZE, transaction_batches
+
+CHUNK_SIZE = 64 * 1024
+
+
+def buffered(path, classifier):
+    with open(path, "rb") as f:
+        transactions = [json.loads(line) for line in f.read().splitlines()]
+    df = load_transactions(transactions)
+    return compute_insights(df), classifier.spend_by_category(df)
+
+
+async def _chunks(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def streamed(path, classifier, batch_size):
+    async def run():
+        accumulator = InsightsAccumulator(classifier)
+        async for batch in transaction_batches(_chunks(path), batch_size=batch_size):
+            accumulator.add(load_transactions(batch))
+        return accumulator.insights(), accumulator.category_spend
+
+    return asyncio.run(run())
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024), elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE)
+    parser.add_argument("--json", metavar="PATH", help="also save the results as JSON")
+    args = parser.parse_args()
+    classifier = MerchantClassifier.from_csv()
+
+    rows = []
+    print(f"{'rows':>10} {'body MB':>8} {'buffered peak MB':>17} {'streamed peak MB':>17} {'buffered ms':>12} {'streamed ms':>12}")
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as f:
+            for transaction in generate_transactions(size, accounts=4):
+                f.write(json.dumps(transaction) + "\n")
+        try:
+            body_mb = os.path.getsize(f.name) / (1024 * 1024)
+            buffered_mb, buffered_ms = measure(buffered, f.name, classifier)
+            streamed_mb, streamed_ms = measure(streamed, f.name, classifier, args.batch_size)
+        finally:
+            os.unlink(f.name)
+        rows.append({
+            "rows": size,
+            "body_mb": body_mb,
+            "buffered_peak_mb": buffered_mb,
+            "streamed_peak_mb": streamed_mb,
+            "buffered_ms": buffered_ms,
+            "streamed_ms": streamed_ms,
+        })
+        print(
+            f"{size:>10} {body_mb:>8.1f} {buffered_mb:>17.1f} {streamed_mb:>17.1f} "
+            f"{buffered_ms:>12.0f} {streamed_ms:>12.0f}"
+        )
+    if args.json:
+        results.save(args.json, "stream_memory", rows, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
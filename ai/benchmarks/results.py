@@ -0,0 +1,104 @@
+"""Saving benchmark results as JSON, and comparing two saved runs.
+
+Every results file records the commit and library versions it was measured
+on, so runs from two commits can be diffed:
+
+    python -m benchmarks.bench_stages --json before.json
+    git checkout <other commit>
+    python -m benchmarks.bench_stages --json after.json
+    python -m benchmarks.results before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+PACKAGES = ["fastapi", "pandas", "numpy", "scikit-learn", "scipy", "matplotlib", "pydantic"]
+
+
+def _git(*args):
+    try:
+        out = subprocess.run(["git", *args], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+def save(path, benchmark, results, **params):
+    """Write ``results`` (a list of flat dicts) with the run's parameters and environment."""
+    document = {
+        "benchmark": benchmark,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": params,
+        "environment": environment(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Saved {len(results)} results to {path}")
+
+
+def _key(result):
+    # Identifying fields are strings and ints; measurements are floats
+    return tuple((k, v) for k, v in sorted(result.items()) if not isinstance(v, float))
+
+
+def compare(before, after, threshold):
+    """Print metrics that changed by more than ``threshold`` (a fraction); returns the count."""
+    previous = {_key(r): r for r in before["results"]}
+    regressions = 0
+    print(f"{before['environment']['commit']} -> {after['environment']['commit']} ({after['benchmark']})")
+    for result in after["results"]:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        label = " ".join(f"{k}={v}" for k, v in _key(result))
+        for metric, value in result.items():
+            if not isinstance(value, float) or not old.get(metric):
+                continue
+            change = value / old[metric] - 1
+            if abs(change) < threshold:
+                continue
+            # Latencies and peaks regress upwards, rates downwards
+            worse = change < 0 if metric.endswith("_per_sec") else change > 0
+            regressions += worse
+            print(f"  {'WORSE' if worse else 'better':<6} {label} {metric}: {old[metric]:.3f} -> {value:.3f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="ignore changes smaller than this fraction")
+    args = parser.parse_args()
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    sys.exit(1 if compare(before, after, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Synthetic Open Finance transactions and intent queries for benchmarks.
+
+Transactions follow the Open Finance shape the endpoints receive: nested
+``Amount`` and ``MerchantDetails``, a ``CreditDebitIndicator``, payment mode,
+transaction type and an ISO timestamp. Debits come from a weighted set of UAE
+merchants with per-merchant amount ranges and the payment modes that merchant
+would plausibly see; credits are a monthly salary per account plus occasional
+refunds and transfers in. Output is deterministic for a given seed.
+"""
+import random
+from datetime import datetime, timedelta
+
+# (merchant, relative frequency, (min, max) amount in AED, payment modes, transaction type)
+MERCHANT_PROFILES = [
+    ("Talabat", 14, (25, 180), ["Online"], "ECommerce"),
+    ("Deliveroo", 6, (30, 160), ["Online"], "ECommerce"),
+    ("Starbucks Coffee", 10, (15, 60), ["POS"], "POS"),
+    ("Dubai Mall Restaurant", 5, (80, 600), ["POS"], "POS"),
+    ("Lulu Hypermarket", 9, (40, 900), ["POS", "Online"], "POS"),
+    ("Carrefour", 9, (30, 850), ["POS", "Online"], "POS"),
+    ("Spinneys", 4, (50, 500), ["POS"], "POS"),
+    ("Emirates Airline", 1, (900, 7500), ["Online"], "ECommerce"),
+    ("Booking.com", 1, (350, 4200), ["Online"], "ECommerce"),
+    ("Careem", 8, (15, 120), ["Online"], "ECommerce"),
+    ("VOX Cinemas", 3, (45, 250), ["Online", "POS"], "POS"),
+    ("Netflix", 1, (39, 69), ["Online"], "ECommerce"),
+    ("ENOC", 6, (60, 250), ["POS"], "POS"),
+    ("DEWA", 1, (250, 1400), ["Online", "Transfer"], "Transfer"),
+    ("Etisalat", 1, (150, 600), ["Online"], "ECommerce"),
+    ("Amazon.ae", 5, (20, 1500), ["Online"], "ECommerce"),
+    ("ATM Withdrawal", 3, (100, 2000), ["ATM"], "ATM"),
+]
+MERCHANTS = [profile[0] for profile in MERCHANT_PROFILES]
+PAYMENT_MODES = sorted({mode for profile in MERCHANT_PROFILES for mode in profile[3]})
+TRANSACTION_TYPES = sorted({profile[4] for profile in MERCHANT_PROFILES} | {"Transfer"})
+
+# Phrasings users type into the assistant, mapped loosely onto end_points.csv
+QUERY_TEMPLATES = [
+    "check my {} balance", "show my {} accounts", "how much money is in my {} account",
+    "list my beneficiaries", "add a new beneficiary", "show recent {} transactions",
+    "pay my {} bill", "send money to a friend", "view standing orders", "show direct debits",
+    "get my {} statement", "manage consents", "apply for a {} credit card", "open a savings account",
+    "what did I spend on {} last month", "show scheduled payments", "track my spending on {}",
+]
+QUERY_FILLERS = ["savings", "current", "credit card", "DEWA", "grocery", "travel", "salary", "joint", "dining"]
+
+
+def _timestamp(when):
+    return when.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def generate_transactions(n, seed=0, accounts=1, start=datetime(2023, 1, 1), days=365):
+    """``n`` transactions spread over ``accounts`` accounts and ``days`` days from ``start``."""
+    rng = random.Random(seed)
+    weights = [profile[1] for profile in MERCHANT_PROFILES]
+    salaries = [rng.choice([12_000, 18_500, 25_000, 40_000]) for _ in range(accounts)]
+    transactions = []
+    for i in range(n):
+        account = i % accounts
+        when = start + timedelta(seconds=rng.randrange(days * 86400))
+        transaction = {
+            "AccountId": f"ACC{account:04d}",
+            "TransactionId": f"TX{i:09d}",
+            "TransactionDateTime": _timestamp(when),
+        }
+        roll = rng.random()
+        if roll < 0.04:
+            # Salary lands around the 25th of the month
+            when = when.replace(day=min(25 + rng.randrange(3), 28), hour=9, minute=0, second=0)
+            transaction["TransactionDateTime"] = _timestamp(when)
+            amount, modes, kind, merchant = salaries[account], ["Transfer"], "Transfer", None
+            credit = True
+        elif roll < 0.12:
+            # Refunds and transfers in
+            amount, modes, kind = rng.uniform(20, 3000), ["Transfer", "Online"], "Transfer"
+            merchant = rng.choice([None, rng.choice(MERCHANTS)])
+            credit = True
+        else:
+            merchant, _, (low, high), modes, kind = rng.choices(MERCHANT_PROFILES, weights)[0]
+            amount = rng.uniform(low, high)
+            credit = False
+        transaction["CreditDebitIndicator"] = "Credit" if credit else "Debit"
+        transaction["Amount"] = {"Amount": f"{amount:.2f}", "Currency": "AED"}
+        if merchant is not None:
+            transaction["MerchantDetails"] = {"MerchantName": merchant}
+        transaction["PaymentModes"] = rng.choice(modes)
+        transaction["TransactionType"] = kind
+        transactions.append(transaction)
+    return transactions
+
+
+def generate_queries(n, seed=0):
+    """``n`` free-text assistant queries for /predict."""
+    rng = random.Random(seed)
+    return [rng.choice(QUERY_TEMPLATES).format(rng.choice(QUERY_FILLERS)) for _ in range(n)]
@@ -0,0 +1,38 @@
+"""Prebuild the intent matcher's index so workers can memory-map it at startup.
+
+Run from the ai/ directory after changing end_points.csv, with the same
+AI_MATCHER as the service (or --matcher):
+
+    python build_index.py
+
+Workers fall back to fitting the vectorizer themselves when the index is
+missing or was built from a different end_points.csv or matcher.
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from catalog import INTENT_INDEX_DIR, INTENTS_FILE, file_sha256, fit_intent_index, save_intent_index
+from matcher import BACKENDS, MATCHER_BACKEND, intent_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--intents", default=INTENTS_FILE, help="intent catalog CSV")
+    parser.add_argument("--out", default=INTENT_INDEX_DIR, help="output directory")
+    parser.add_argument("--matcher", choices=sorted(BACKENDS), default=MATCHER_BACKEND)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    intents = pd.read_csv(args.intents)
+    vectorizer, index = fit_intent_index(intent_texts(intents)[0], args.matcher)
+    save_intent_index(args.out, vectorizer, index, file_sha256(args.intents), args.matcher)
+    print(
+        f"Wrote {args.out}/ ({args.matcher}: {len(intents)} intents, {index.shape[1]} texts, {index.shape[0]} terms) "
+        f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
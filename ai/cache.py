@@ -0,0 +1,144 @@
+"""Content-addressed cache for encoded AI responses.
+
+Entries are keyed by a SHA-256 of the endpoint name, render parameters and the
+canonicalized JSON payload, so the same transaction list always maps to the
+same key (and ETag) whatever the key order in the request. Values are the
+already-encoded response bodies, so a hit skips both computation and encoding.
+
+Every key is salted with the cache's ``version``, which covers RESPONSE_VERSION
+and whatever data files the service passes in. A deploy that changes what the
+endpoints return thus gets new keys and ETags, so clients and the disk tier do
+not keep serving the old bodies.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "256"))
+CACHE_TTL_SECONDS = float(os.environ.get("AI_CACHE_TTL_SECONDS", "600"))
+CACHE_DIR = os.environ.get("AI_CACHE_DIR") or None
+# Bump whenever a code change alters the body of a cached response
+RESPONSE_VERSION = 2
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def response_version(data_files=()):
+    """RESPONSE_VERSION plus a digest of ``data_files``, the inputs responses depend on."""
+    digest = hashlib.sha256()
+    for path in data_files:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return f"{RESPONSE_VERSION}:{digest.hexdigest()[:16]}"
+
+
+class ResultCache:
+    """In-process LRU/TTL cache of response bodies with an optional on-disk tier.
+
+    The disk tier (``disk_dir``) is shared by every worker on the host and
+    survives restarts; entries there expire on the same TTL using file mtimes.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, disk_dir=CACHE_DIR, data_files=()):
+        self.version = response_version(data_files)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()  # sync endpoints run in the threadpool
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, endpoint, payload, **params):
+        canonical = json.dumps(
+            {"version": self.version, "endpoint": endpoint, "params": params, "payload": payload},
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def etag(key):
+        return f'"{key}"'
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                body, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                del self._entries[key]
+        body = self._disk_get(key)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put(key, body, now)
+        return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._put(key, body, time.monotonic())
+        self._disk_set(key, body)
+
+    def _put(self, key, body, now):
+        self._entries[key] = (body, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _disk_set(self, key, body):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so other workers never read a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_dir": self.disk_dir,
+                "version": self.version,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,196 @@
+"""Credit card scoring over a precomputed benefit matrix.
+
+Every card in ``cards.json`` becomes one immutable Card and one column of the
+matrices below, built once per catalog load. A customer is described by a
+spend vector (debit spend per merchant category plus ``all``, the total), and
+scoring is a single matrix product:
+
+    score   = base_score + 100 * (spend / total) @ share_weights
+    savings = min(spend @ reward_rates, monthly_cap) + monthly_bonus
+
+Cards whose ``requires`` category has no spend, or whose ``min_spend`` /
+``max_spend`` thresholds exclude the customer's total, are not eligible. The
+top cards are then picked with at most one card per ``family`` until the
+families run out. Card benefits that ``cards.json`` leaves out are read from
+the bank's card listing in ``creditcard.txt``.
+"""
+import json
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+TOTAL = "all"  # spend feature holding the customer's total debit spend
+RECOMMENDATIONS = 4
+
+
+class Card(NamedTuple):
+    id: str
+    family: str
+    name: str
+    reason: str
+    benefits: Tuple[str, ...]
+    apply_url: str
+    potential_savings: str
+    requires: Optional[str]
+
+    def render(self, score, spend, savings, total_spent):
+        values = {"spend": spend, "score": score, "total_spent": total_spent, "savings": savings}
+        return {
+            "name": self.name,
+            "reason": self.reason.format(**values),
+            "benefits": list(self.benefits),
+            "apply_url": self.apply_url,
+            "potential_savings": self.potential_savings.format(**values),
+        }
+
+
+def parse_card_listing(text):
+    """{card name: benefit lines} from the card listing text in creditcard.txt."""
+    listing = {}
+    for block in text.split("\nCompare"):
+        lines = [line.strip() for line in block.strip().splitlines() if line.strip()]
+        if len(lines) < 3:
+            continue
+        # Name (repeated), tagline, then benefits up to the "Read more" link
+        name, body = lines[0], lines[2:]
+        if "Read more" in body:
+            body = body[:body.index("Read more")]
+        listing[name] = tuple(dict.fromkeys(body))
+    return listing
+
+
+def spending_summary(total_spent, category_spend):
+    """The spend figures returned next to card recommendations."""
+    return {
+        "total_spent": round(total_spent, 2),
+        "travel_spend": round(category_spend.get("travel", 0.0), 2),
+        "food_spend": round(category_spend.get("food", 0.0), 2),
+        "grocery_spend": round(category_spend.get("grocery", 0.0), 2),
+        "entertainment_spend": round(category_spend.get("entertainment", 0.0), 2)
+    }
+
+
+class CardEngine:
+    """The card catalog as matrices; see the module docstring for the scoring rule."""
+
+    def __init__(self, definitions, listing=None):
+        listing = listing or {}
+        cards = []
+        for d in definitions:
+            benefits = d.get("benefits")
+            if benefits is None:
+                if d["name"] not in listing:
+                    raise ValueError(f"No benefits for card {d['name']!r} in cards.json or the card listing")
+                benefits = listing[d["name"]]
+            cards.append(Card(
+                id=d["category"],
+                family=d.get("family", d["category"]),
+                name=d["name"],
+                reason=d["reason"],
+                benefits=tuple(benefits),
+                apply_url=d["apply_url"],
+                potential_savings=d["potential_savings"],
+                requires=d.get("requires"),
+            ))
+        self.cards = tuple(cards)
+        if len({card.id for card in self.cards}) != len(self.cards):
+            raise ValueError("Card categories in cards.json must be unique")
+
+        features = {TOTAL}
+        for d in definitions:
+            features.update(d.get("share_weights", {}), d.get("reward_rates", {}))
+            if d.get("requires"):
+                features.add(d["requires"])
+        self.features = sorted(features)
+        column = {feature: i for i, feature in enumerate(self.features)}
+        n, f = len(definitions), len(self.features)
+
+        self.share_weights = np.zeros((f, n))
+        self.reward_rates = np.zeros((f, n))
+        self.base_score = np.zeros(n)
+        self.monthly_cap = np.full(n, np.inf)
+        self.monthly_bonus = np.zeros(n)
+        self.min_spend = np.full(n, -np.inf)
+        self.max_spend = np.full(n, np.inf)
+        self.requires = np.full(n, -1)
+        for j, d in enumerate(definitions):
+            for feature, weight in d.get("share_weights", {}).items():
+                self.share_weights[column[feature], j] = weight * 100
+            for feature, rate in d.get("reward_rates", {}).items():
+                self.reward_rates[column[feature], j] = rate
+            self.base_score[j] = d.get("base_score", 0)
+            self.monthly_cap[j] = d["monthly_cap"] if d.get("monthly_cap") is not None else np.inf
+            self.monthly_bonus[j] = d.get("monthly_bonus", 0)
+            self.min_spend[j] = d["min_spend"] if d.get("min_spend") is not None else -np.inf
+            self.max_spend[j] = d["max_spend"] if d.get("max_spend") is not None else np.inf
+            if d.get("requires"):
+                self.requires[j] = column[d["requires"]]
+        self._total = column[TOTAL]
+        _, self.family_codes = np.unique([card.family for card in self.cards], return_inverse=True)
+        for matrix in (self.share_weights, self.reward_rates, self.base_score, self.monthly_cap,
+                       self.monthly_bonus, self.min_spend, self.max_spend, self.requires, self.family_codes):
+            matrix.setflags(write=False)
+
+    @classmethod
+    def from_files(cls, cards_path, listing_path):
+        """Engine for the card definitions in ``cards_path`` and the card listing in ``listing_path``."""
+        with open(cards_path, "r", encoding="utf-8") as f:
+            definitions = json.load(f)
+        with open(listing_path, "r", encoding="utf-8") as f:
+            return cls(definitions, parse_card_listing(f.read()))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def spend_vectors(self, customers):
+        """(customers x features) spend matrix from (total_spent, {category: spend}) pairs."""
+        return np.array([
+            [total_spent if feature == TOTAL else category_spend.get(feature, 0.0) for feature in self.features]
+            for total_spent, category_spend in customers
+        ], dtype=float).reshape(len(customers), len(self.features))
+
+    def score(self, spend):
+        """(scores, savings), both customers x cards; ineligible cards score -inf."""
+        total = spend[:, self._total:self._total + 1]
+        scores = self.base_score + (spend / np.maximum(total, 1)) @ self.share_weights
+        savings = np.minimum(spend @ self.reward_rates, self.monthly_cap) + self.monthly_bonus
+        eligible = (total > self.min_spend) & (total < self.max_spend)
+        required = np.where(self.requires >= 0, spend[:, np.maximum(self.requires, 0)], 1.0)
+        eligible &= required > 0
+        return np.where(eligible, scores, -np.inf), savings
+
+    def top_k(self, scores, k=RECOMMENDATIONS):
+        """Per customer, indices of the best k eligible cards, one per family before repeating any."""
+        order = np.argsort(-scores, axis=1, kind="stable").tolist()
+        eligible = np.isfinite(scores).tolist()
+        families = self.family_codes.tolist()
+        picks = []
+        for row, ok in zip(order, eligible):
+            first, rest, seen = [], [], set()
+            for j in row:
+                if not ok[j]:
+                    break  # -inf sorts last, so the rest are ineligible too
+                if families[j] in seen:
+                    rest.append(j)
+                else:
+                    seen.add(families[j])
+                    first.append(j)
+                    if len(first) == k:
+                        break
+            picks.append((first + rest)[:k])
+        return picks
+
+    def recommend_many(self, customers, k=RECOMMENDATIONS):
+        """Card recommendations for each (total_spent, {category: spend}) pair."""
+        spend = self.spend_vectors(customers)
+        scores, savings = self.score(spend)
+        requires = np.where(self.requires >= 0, spend[:, np.maximum(self.requires, 0)], 0.0).tolist()
+        picks = self.top_k(scores, k)
+        scores, savings = scores.tolist(), savings.tolist()
+        return [
+            [self.cards[j].render(scores[i][j], requires[i][j], savings[i][j], total_spent) for j in picked]
+            for i, ((total_spent, _), picked) in enumerate(zip(customers, picks))
+        ]
+
+    def recommend(self, total_spent, category_spend, k=RECOMMENDATIONS):
+        return self.recommend_many([(total_spent, category_spend)], k)[0]
@@ -0,0 +1,297 @@
+"""Hot-reloadable intent and card catalogs.
+
+The intent catalog (``end_points.csv``) with its matcher.IntentMatcher,
+together with the card catalog (``cards.json`` plus the bank's card listing in
+``creditcard.txt``, compiled into a cards.CardEngine), are held in an
+immutable CatalogSnapshot.
+Handlers read ``catalog.snapshot`` once per request, so an in-flight request
+keeps using the snapshot it started with. A reload builds the replacement
+snapshot off the event loop and swaps it in with a single assignment.
+
+The first snapshot is built on first use, so workers that only serve routes
+without intent matching never import scikit-learn. When ``build_index.py``
+has written a prebuilt index for the current ``end_points.csv`` and matcher,
+it is memory-mapped instead of refitting the vectorizer.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cards import CardEngine
+from matcher import BACKENDS, MATCHER_BACKEND, IntentMatcher, intent_texts
+
+INTENTS_FILE = "end_points.csv"
+CARDS_FILE = "cards.json"
+CARD_LISTING_FILE = "creditcard.txt"
+INTENT_INDEX_DIR = os.environ.get("AI_INTENT_INDEX", "intent_index")
+CATALOG_POLL_SECONDS = float(os.environ.get("AI_CATALOG_POLL_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot(NamedTuple):
+    version: int
+    loaded_at: float
+    intents: pd.DataFrame
+    vectorizer: Any  # fitted sklearn TfidfVectorizer
+    index: Any  # transposed, L2-normalized TF-IDF matrix (terms x intent texts)
+    matcher: IntentMatcher
+    cards: CardEngine
+    cards_sha256: str  # of cards.json and the card listing, for cache keys
+    mtimes: Tuple[int, ...]
+    index_source: str  # "prebuilt" or "fitted"
+    build_ms: float
+
+
+def _mtimes(paths):
+    return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def fit_intent_index(texts, matcher_backend=MATCHER_BACKEND):
+    """Fit the matcher's TF-IDF vectorizer; returns (vectorizer, transposed L2-normalized index)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
+    vectorizer = TfidfVectorizer(**BACKENDS[matcher_backend][0])
+    X = vectorizer.fit_transform(texts)
+    return vectorizer, normalize(X).T.tocsr()
+
+
+def _index_params(matcher_backend):
+    # As they read back from meta.json (tuples become lists)
+    return {"matcher": matcher_backend, "params": json.loads(json.dumps(BACKENDS[matcher_backend][0]))}
+
+
+def save_intent_index(directory, vectorizer, index, source_sha256, matcher_backend=MATCHER_BACKEND):
+    os.makedirs(directory, exist_ok=True)
+    for name in ("data", "indices", "indptr"):
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(index, name))
+    np.save(os.path.join(directory, "idf.npy"), vectorizer.idf_)
+    vocabulary = {term: int(i) for term, i in vectorizer.vocabulary_.items()}
+    with open(os.path.join(directory, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+    # Written last, so a half-written index is never taken for a complete one
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"source_sha256": source_sha256, "shape": list(index.shape), **_index_params(matcher_backend)}, f)
+
+
+class PrebuiltVectorizer:
+    """transform() of a fitted TfidfVectorizer, without scikit-learn.
+
+    Importing scikit-learn dominates a worker's cold start, and for the
+    settings the matchers use (lowercasing, word tokens of 2+ characters or
+    character n-grams within words, raw or sublinear term counts, L2 norm) the
+    transform is a vocabulary lookup scaled by the saved idf weights.
+    """
+
+    token_pattern = re.compile(r"(?u)\b\w\w+\b")
+    white_spaces = re.compile(r"\s\s+")
+
+    def __init__(self, vocabulary, idf, params=None):
+        params = params or {}
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.analyzer = params.get("analyzer", "word")
+        self.ngram_range = tuple(params.get("ngram_range", (1, 1)))
+        self.sublinear_tf = params.get("sublinear_tf", False)
+
+    def _terms(self, text):
+        text = text.lower()
+        if self.analyzer == "word":
+            return self.token_pattern.findall(text)
+        # Same n-grams as scikit-learn's "char_wb" analyzer: words padded with one space
+        min_n, max_n = self.ngram_range
+        terms = []
+        for word in self.white_spaces.sub(" ", text).split():
+            word = f" {word} "
+            for n in range(min_n, max_n + 1):
+                terms.extend(word[i:i + n] for i in range(max(1, len(word) - n + 1)))
+                if len(word) <= n:
+                    break  # a short word is counted once
+        return terms
+
+    def transform(self, texts):
+        from scipy.sparse import csr_matrix
+
+        indptr, indices, counts = [0], [], []
+        for text in texts:
+            row = {}
+            for term in self._terms(text):
+                column = self.vocabulary_.get(term)
+                if column is not None:
+                    row[column] = row.get(column, 0) + 1
+            columns = sorted(row)
+            indices.extend(columns)
+            counts.extend(row[c] for c in columns)
+            indptr.append(len(indices))
+        indices = np.array(indices, dtype=np.int32)
+        data = np.array(counts, dtype=np.float64)
+        if self.sublinear_tf:
+            data = np.log(data) + 1
+        data *= self.idf_[indices]
+        row_lengths = np.diff(indptr)
+        norms = np.sqrt(np.bincount(np.repeat(np.arange(len(row_lengths)), row_lengths), data * data, len(row_lengths)))
+        norms[norms == 0] = 1
+        data /= np.repeat(norms, row_lengths)
+        return csr_matrix((data, indices, np.array(indptr)), shape=(len(row_lengths), len(self.idf_)))
+
+
+def load_intent_index(directory, source_sha256, matcher_backend=MATCHER_BACKEND):
+    """Memory-map a prebuilt index; None if missing or built from another end_points.csv or matcher."""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    expected = _index_params(matcher_backend)
+    if meta.get("source_sha256") != source_sha256 or {k: meta.get(k) for k in expected} != expected:
+        return None
+    from scipy.sparse import csr_matrix
+
+    # mmap_mode keeps the arrays in the page cache, shared by every worker on the host
+    arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ("data", "indices", "indptr")]
+    index = csr_matrix(tuple(arrays), shape=tuple(meta["shape"]), copy=False)
+    with open(os.path.join(directory, "vocabulary.json"), encoding="utf-8") as f:
+        vocabulary = json.load(f)
+    idf = np.load(os.path.join(directory, "idf.npy"))
+    return PrebuiltVectorizer(vocabulary, idf, BACKENDS[matcher_backend][0]), index
+
+
+def build_snapshot(version, intents_path=INTENTS_FILE, cards_path=CARDS_FILE, index_dir=INTENT_INDEX_DIR,
+                   card_listing_path=CARD_LISTING_FILE, matcher_backend=MATCHER_BACKEND):
+    started = time.perf_counter()
+    mtimes = _mtimes((intents_path, cards_path, card_listing_path))
+    intents = pd.read_csv(intents_path)
+    texts, labels = intent_texts(intents)
+    prebuilt = load_intent_index(index_dir, file_sha256(intents_path), matcher_backend) if index_dir else None
+    vectorizer, index = prebuilt or fit_intent_index(texts, matcher_backend)
+    cards = CardEngine.from_files(cards_path, card_listing_path)
+    return CatalogSnapshot(
+        version=version,
+        loaded_at=time.time(),
+        intents=intents,
+        vectorizer=vectorizer,
+        index=index,
+        matcher=IntentMatcher(matcher_backend, vectorizer, index, labels),
+        cards=cards,
+        cards_sha256=hashlib.sha256(
+            "".join(file_sha256(path) for path in (cards_path, card_listing_path)).encode("ascii")
+        ).hexdigest(),
+        mtimes=mtimes,
+        index_source="prebuilt" if prebuilt else "fitted",
+        build_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+class Catalog:
+    def __init__(self, intents_path=INTENTS_FILE, cards_path=CARDS_FILE, index_dir=INTENT_INDEX_DIR,
+                 card_listing_path=CARD_LISTING_FILE, matcher_backend=MATCHER_BACKEND):
+        if matcher_backend not in BACKENDS:
+            raise ValueError(f"Unknown matcher {matcher_backend!r}; expected one of {sorted(BACKENDS)}")
+        self.intents_path = intents_path
+        self.cards_path = cards_path
+        self.index_dir = index_dir
+        self.card_listing_path = card_listing_path
+        self.matcher_backend = matcher_backend
+        self._lock = threading.Lock()
+        self.last_error = None
+        self._failed_mtimes = None
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = build_snapshot(1, *self._build_args)
+                snapshot = self._snapshot
+        return snapshot
+
+    async def current(self):
+        """``snapshot`` for async code: the first build, or a wait on it, runs in a thread, off the event loop."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = await asyncio.to_thread(lambda: self.snapshot)
+        return snapshot
+
+    @property
+    def _build_args(self):
+        return self.intents_path, self.cards_path, self.index_dir, self.card_listing_path, self.matcher_backend
+
+    @property
+    def paths(self):
+        return (self.intents_path, self.cards_path, self.card_listing_path)
+
+    @property
+    def warm(self):
+        return self._snapshot is not None
+
+    def changed(self):
+        if not self.warm:
+            return False  # nothing loaded yet; the first use reads the current files
+        try:
+            mtimes = _mtimes(self.paths)
+        except OSError:
+            return False  # a file is mid-replace; look again on the next poll
+        # Files that already failed to load are not retried until they change again
+        return mtimes != self.snapshot.mtimes and mtimes != self._failed_mtimes
+
+    def reload(self):
+        """Build a new snapshot and swap it in; the old one stays live if the build fails."""
+        with self._lock:
+            try:
+                version = self._snapshot.version + 1 if self._snapshot else 1
+                snapshot = build_snapshot(version, *self._build_args)
+            except Exception as e:
+                self.last_error = str(e)
+                try:
+                    self._failed_mtimes = _mtimes(self.paths)
+                except OSError:
+                    self._failed_mtimes = None
+                raise
+            self.last_error = None
+            self._snapshot = snapshot
+            return snapshot
+
+    async def watch(self, interval=CATALOG_POLL_SECONDS):
+        """Poll the catalog files and reload in a worker thread when they change."""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.changed():
+                continue
+            try:
+                await asyncio.to_thread(self.reload)
+                logger.info("Reloaded catalogs (version %d)", self.snapshot.version)
+            except Exception:
+                logger.exception("Catalog reload failed, keeping version %d", self.snapshot.version)
+
+    def status(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"warm": False, "last_error": self.last_error}
+        return {
+            "warm": True,
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "intents": len(snapshot.intents),
+            "cards": len(snapshot.cards),
+            "index_source": snapshot.index_source,
+            "matcher": snapshot.matcher.status(),
+            "build_ms": round(snapshot.build_ms, 1),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,66 @@
+"""Merchant categorization for credit-card recommendations.
+
+The taxonomy lives in ``merchant_categories.csv`` (one ``category,keyword`` row
+per keyword, categories in priority order). All keywords are compiled into a
+single regex once, and each distinct merchant name is classified only once.
+"""
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES_FILE = "merchant_categories.csv"
+
+
+class MerchantClassifier:
+    def __init__(self, taxonomy, cache_size=4096):
+        """``taxonomy`` is an iterable of (category, keyword) pairs in priority order."""
+        taxonomy = [(str(category), str(keyword).lower()) for category, keyword in taxonomy]
+        self.categories = list(dict.fromkeys(category for category, _ in taxonomy))
+        self._priority = {}
+        for category, keyword in taxonomy:
+            self._priority.setdefault(keyword, self.categories.index(category))
+        # The lookahead reports a match at every position, and ordering the
+        # alternatives by priority makes the best keyword win where several start
+        keywords = sorted(self._priority, key=lambda k: (self._priority[k], -len(k)))
+        self._pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+        # Merchant names repeat across requests, so results are kept in an LRU cache
+        self.classify = functools.lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def from_csv(cls, path=CATEGORIES_FILE, **kwargs):
+        df = pd.read_csv(path)
+        return cls(zip(df["category"], df["keyword"]), **kwargs)
+
+    def _classify(self, merchant):
+        best = None
+        for match in self._pattern.finditer(merchant.lower()):
+            priority = self._priority[match.group(1)]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return None if best is None else self.categories[best]
+
+    def row_categories(self, df):
+        """Category of each row of a frame from ingest.load_transactions (None when unknown)."""
+        if "MerchantName" not in df.columns:
+            return np.full(len(df), None, dtype=object)
+        merchants = df["MerchantName"].cat
+        # Classify each distinct merchant once, then broadcast the labels to rows
+        labels = np.array([self.classify(str(name)) for name in merchants.categories] + [None], dtype=object)
+        return labels[merchants.codes.to_numpy()]  # code -1 (no merchant) picks the trailing None
+
+    def spend_by_category(self, df):
+        """Total debit spend per category for a frame from ingest.load_transactions.
+
+        Every category in the taxonomy is present in the result (0.0 if unused).
+        """
+        totals = dict.fromkeys(self.categories, 0.0)
+        if "MerchantName" not in df.columns or df.empty:
+            return totals
+        spend = (-df["SignedAmount"]).clip(lower=0)
+        for category, total in spend.groupby(self.row_categories(df)).sum().items():
+            totals[category] = float(total)
+        return totals
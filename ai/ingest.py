@@ -0,0 +1,103 @@
+"""Columnar ingestion of Open Finance transaction payloads.
+
+Transactions arrive as a list of nested dicts. Instead of flattening every key
+with ``pd.json_normalize`` and then fixing up columns row by row, the fields the
+AI endpoints actually use are pulled out in a single pass and converted to
+typed columns with vectorized pandas/NumPy operations.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Categorical columns that are only added to the frame when the payload has them
+OPTIONAL_COLUMNS = ["MerchantName", "PaymentModes", "TransactionType"]
+
+
+def _is_credit(indicators):
+    # Compare each distinct indicator once instead of once per row
+    codes, uniques = pd.factorize(np.asarray(indicators, dtype=object))
+    credit = np.array([str(u).lower() == "credit" for u in uniques] + [False])
+    return credit[codes]  # code -1 (missing) picks the trailing False
+
+
+def _to_float(values):
+    try:
+        return np.array(values, dtype="float64")
+    except (TypeError, ValueError):
+        # Malformed amounts become NaN, as pd.to_numeric(errors="coerce") would give
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").astype("float64").to_numpy()
+
+
+# The UTC offset at the end of an ISO 8601 timestamp: "Z", "+04:00" or "+0400"
+_OFFSET = re.compile(r"(Z|[+-]\d\d:?\d\d)$")
+
+
+def _offsets(series):
+    """The offset suffix of each value (None without one), or None when all values share one."""
+    try:
+        tails = series.str[-6:]
+    except AttributeError:  # no strings at all
+        return None
+    zones = {}
+    for tail in pd.unique(tails):
+        match = _OFFSET.search(tail) if isinstance(tail, str) else None
+        zones[tail] = match.group(1) if match else None
+    if len(set(zones.values())) < 2:
+        return None
+    return tails.map(zones)
+
+
+def _parse_datetime(values):
+    parsed = pd.to_datetime(values, errors="coerce")
+    if parsed.dt.tz is not None:
+        # Keep the wall-clock time the bank reported so months bucket the same way
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+
+def _to_datetime(values):
+    series = pd.Series(values, dtype=object)
+    offsets = _offsets(series)
+    if offsets is None:
+        return _parse_datetime(series)
+    # pandas cannot parse mixed UTC offsets into one column without converting
+    # to UTC, so each offset is parsed on its own and keeps its wall-clock time
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    for zone, rows in series.groupby(offsets.fillna(""), sort=False):
+        parsed[rows.index] = _parse_datetime(rows)
+    return parsed
+
+
+def load_transactions(transactions):
+    """Build a typed DataFrame from a list of Open Finance transactions.
+
+    Columns: TransactionId, AccountId (object), Amount (float64), IsCredit
+    (bool), SignedAmount (float64, negative for debits), TransactionDateTime
+    (datetime64) and, when present in the payload, MerchantName, PaymentModes
+    and TransactionType as categoricals. ``Amount`` may be nested
+    (``{"Amount": "12.50", "Currency": "AED"}``) or a plain number.
+    """
+    # One comprehension per field is markedly faster than a single loop appending to many lists
+    amounts = [t.get("Amount") for t in transactions]
+    amounts = [a.get("Amount") if isinstance(a, dict) else a for a in amounts]
+    indicators = [t.get("CreditDebitIndicator") for t in transactions]
+    merchants = [t.get("MerchantDetails") for t in transactions]
+    merchants = [m.get("MerchantName") if isinstance(m, dict) else None for m in merchants]
+    modes = [t.get("PaymentModes") for t in transactions]
+    types = [t.get("TransactionType") for t in transactions]
+
+    amount = _to_float(amounts)
+    is_credit = _is_credit(indicators)
+    df = pd.DataFrame({
+        "TransactionId": pd.Series([t.get("TransactionId") for t in transactions], dtype=object),
+        "AccountId": pd.Series([t.get("AccountId") for t in transactions], dtype=object),
+        "Amount": amount,
+        "IsCredit": is_credit,
+        "SignedAmount": np.where(is_credit, amount, -amount),
+        "TransactionDateTime": _to_datetime([t.get("TransactionDateTime") for t in transactions]),
+    })
+    for name, values in zip(OPTIONAL_COLUMNS, (merchants, modes, types)):
+        if any(v is not None for v in values):
+            df[name] = pd.Categorical(values)
+    return df
@@ -0,0 +1,196 @@
+"""PFM aggregates over a frame from ingest.load_transactions.
+
+These are the numbers behind the dashboard charts; /pfm-insights returns them
+as JSON so the frontend can draw the charts itself.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def filter_transactions(df, start_date=None, end_date=None, account_ids=None):
+    """Keep transactions dated within [start_date, end_date] and belonging to account_ids."""
+    mask = pd.Series(True, index=df.index)
+    if start_date is not None:
+        mask &= df["TransactionDateTime"] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= df["TransactionDateTime"] < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    if account_ids:
+        mask &= df["AccountId"].isin(account_ids)
+    return df if mask.all() else df[mask]
+
+
+def _sum_by(df, column):
+    return df.groupby(column, observed=True)["SignedAmount"].sum()
+
+
+def compute_insights(df, top_n=5):
+    insights = {}
+    insights["total_transactions"] = len(df)
+    insights["total_spent"] = round(df[df["SignedAmount"] < 0]["SignedAmount"].sum(), 2)
+    insights["total_income"] = round(df[df["SignedAmount"] > 0]["SignedAmount"].sum(), 2)
+    insights["net_balance_change"] = round(df["SignedAmount"].sum(), 2)
+    if "MerchantName" in df.columns:
+        insights["top_spending_merchants"] = _sum_by(df, "MerchantName").sort_values().head(top_n).to_dict()
+    if "PaymentModes" in df.columns:
+        insights["spending_by_payment_mode"] = _sum_by(df, "PaymentModes").to_dict()
+    monthly_trend = df.groupby(df["TransactionDateTime"].dt.to_period("M"))["SignedAmount"].sum().to_dict()
+    insights["monthly_spending_trend"] = {str(k): v for k, v in monthly_trend.items()}
+    insights["average_transaction_amount"] = round(df["Amount"].mean(), 2)
+    if "TransactionType" in df.columns:
+        insights["transaction_type_breakdown"] = _sum_by(df, "TransactionType").to_dict()
+    return insights
+
+
+# Insights key and source column for each per-label breakdown
+BREAKDOWNS = [
+    ("top_spending_merchants", "MerchantName"),
+    ("spending_by_payment_mode", "PaymentModes"),
+    ("transaction_type_breakdown", "TransactionType"),
+]
+
+
+class InsightsAccumulator:
+    """Mergeable running totals that reproduce compute_insights() over many frames.
+
+    Frames are folded in one at a time with add() (e.g. batches of a streamed
+    upload) and accumulators built separately (e.g. one per account) can be
+    combined with merge(). Memory depends on the number of distinct months,
+    merchants, payment modes and types, not on the number of transactions.
+    With a ``classifier`` it also keeps debit spend per merchant category for
+    card recommendations.
+    """
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier
+        self.total_transactions = 0
+        self.spent = 0.0
+        self.income = 0.0
+        self.amount_sum = 0.0
+        self.amount_count = 0
+        self.sums = {"monthly_spending_trend": {}}
+        self.category_spend = dict.fromkeys(classifier.categories, 0.0) if classifier else {}
+
+    def __getstate__(self):
+        # Partials cross process boundaries; the classifier stays behind
+        return {**self.__dict__, "classifier": None}
+
+    @staticmethod
+    def _fold(target, values):
+        for label, amount in values.items():
+            target[label] = target.get(label, 0.0) + amount
+
+    def add(self, df):
+        signed = df["SignedAmount"]
+        self.total_transactions += len(df)
+        self.spent += float(signed[signed < 0].sum())
+        self.income += float(signed[signed > 0].sum())
+        self.amount_sum += float(df["Amount"].sum())
+        self.amount_count += int(df["Amount"].count())
+        for key, column in BREAKDOWNS:
+            if column in df.columns:
+                self._fold(self.sums.setdefault(key, {}), _sum_by(df, column).to_dict())
+        monthly = df.groupby(df["TransactionDateTime"].dt.to_period("M"))["SignedAmount"].sum()
+        self._fold(self.sums["monthly_spending_trend"], {str(k): v for k, v in monthly.items()})
+        if self.classifier is not None:
+            self._fold(self.category_spend, self.classifier.spend_by_category(df))
+        return self
+
+    def merge(self, other):
+        self.total_transactions += other.total_transactions
+        self.spent += other.spent
+        self.income += other.income
+        self.amount_sum += other.amount_sum
+        self.amount_count += other.amount_count
+        for key, values in other.sums.items():
+            self._fold(self.sums.setdefault(key, {}), values)
+        self._fold(self.category_spend, other.category_spend)
+        return self
+
+    @property
+    def total_spent(self):
+        """Total debit spend as a positive amount, as used for card recommendations."""
+        return abs(self.spent)
+
+    def insights(self, top_n=5):
+        sums = self.sums
+        insights = {
+            "total_transactions": self.total_transactions,
+            "total_spent": round(self.spent, 2),
+            "total_income": round(self.income, 2),
+            "net_balance_change": round(self.spent + self.income, 2),
+        }
+        if "top_spending_merchants" in sums:
+            top = sorted(sums["top_spending_merchants"].items(), key=lambda item: item[1])[:top_n]
+            insights["top_spending_merchants"] = dict(top)
+        if "spending_by_payment_mode" in sums:
+            insights["spending_by_payment_mode"] = dict(sorted(sums["spending_by_payment_mode"].items()))
+        insights["monthly_spending_trend"] = dict(sorted(sums["monthly_spending_trend"].items()))
+        insights["average_transaction_amount"] = (
+            round(self.amount_sum / self.amount_count, 2) if self.amount_count else math.nan
+        )
+        if "transaction_type_breakdown" in sums:
+            insights["transaction_type_breakdown"] = dict(sorted(sums["transaction_type_breakdown"].items()))
+        return insights
+
+
+def accumulate_by(df, column, classifier=None):
+    """{value of df[column]: InsightsAccumulator}, in order of first appearance.
+
+    Gives the same totals as adding each group's rows to an accumulator of its
+    own, but every aggregate is a single grouped pass over the whole frame, so
+    a frame holding thousands of customers costs about as much as one holding
+    a single customer with as many transactions. Rows without a value in
+    ``column`` are skipped.
+    """
+    codes, keys = pd.factorize(df[column])
+    if (codes < 0).any():
+        df, codes = df[codes >= 0], codes[codes >= 0]
+    n = len(keys)
+    signed = df["SignedAmount"].to_numpy()
+    amount = df["Amount"].to_numpy()
+    counted = ~np.isnan(amount)
+    transactions = np.bincount(codes, minlength=n).tolist()
+    spent = np.bincount(codes, np.where(signed < 0, signed, 0.0), minlength=n).tolist()
+    income = np.bincount(codes, np.where(signed > 0, signed, 0.0), minlength=n).tolist()
+    amount_sum = np.bincount(codes, np.where(counted, amount, 0.0), minlength=n).tolist()
+    amount_count = np.bincount(codes, counted, minlength=n).astype(int).tolist()
+
+    accumulators = []
+    for i in range(n):
+        accumulator = InsightsAccumulator(classifier)
+        accumulator.total_transactions = transactions[i]
+        accumulator.spent = spent[i]
+        accumulator.income = income[i]
+        accumulator.amount_sum = amount_sum[i]
+        accumulator.amount_count = amount_count[i]
+        accumulators.append(accumulator)
+
+    def fold(key, labels, name=lambda label: label):
+        # A breakdown only appears for groups with at least one labelled row, as in add()
+        for (code, label), amount in amounts.groupby([codes, labels], observed=True).sum().items():
+            sums = accumulators[code].sums.setdefault(key, {})
+            sums[name(label)] = sums.get(name(label), 0.0) + amount
+
+    amounts = df["SignedAmount"]
+    for key, source in BREAKDOWNS:
+        if source in df.columns:
+            fold(key, df[source])
+    fold("monthly_spending_trend", df["TransactionDateTime"].dt.to_period("M"), str)
+    if classifier is not None and "MerchantName" in df.columns:
+        for (code, category), amount in (-amounts).clip(lower=0).groupby(
+                [codes, classifier.row_categories(df)]).sum().items():
+            accumulators[code].category_spend[category] = float(amount)
+    return dict(zip(keys, accumulators))
+
+
+def compact_insights(insights):
+    """Round amounts to fils and turn NaN into None so the insights can be sent as JSON."""
+    def compact(value):
+        if isinstance(value, dict):
+            return {str(k): compact(v) for k, v in value.items()}
+        if isinstance(value, float):
+            return None if math.isnan(value) else round(value, 2)
+        return value
+    return compact(insights)
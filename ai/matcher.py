@@ -0,0 +1,192 @@
+"""Intent matching for /predict: a text encoder over a cosine vector index.
+
+Two encoders turn text into L2-normalized sparse vectors, selected with
+``AI_MATCHER``:
+
+- ``tfidf`` (default): word TF-IDF, the original matcher
+- ``chargram``: TF-IDF over character 3-5-grams inside words, which still
+  matches misspellings and other word forms ("balnce", "payees")
+
+Neither needs a network or a downloaded model, and build_index.py can
+prebuild either. Each intent is indexed by its
+description plus the phrasings in the optional ``examples`` column of
+end_points.csv ("|"-separated), and an intent scores as its best row.
+
+Catalogs of up to ANN_MIN_ROWS rows are searched exactly with one sparse
+product. Larger ones get an inverted-file index: the rows are clustered with
+spherical k-means, and a query is only compared with the rows of the
+ANN_PROBES clusters whose centroids are closest to it. Single-query results
+are kept in an LRU cache that is rebuilt with every catalog snapshot.
+"""
+import functools
+import os
+
+import numpy as np
+
+from metrics import stage
+
+# components/AIAssistant.tsx still treats scores below tfidf's 0.3 as out of
+# scope itself, so chargram stays opt-in until it follows "status" instead
+MATCHER_BACKEND = os.environ.get("AI_MATCHER", "tfidf")
+ANN_MIN_ROWS = int(os.environ.get("AI_ANN_MIN_ROWS", "20000"))
+ANN_PROBES = int(os.environ.get("AI_ANN_PROBES", "8"))
+MATCH_CACHE_SIZE = int(os.environ.get("AI_MATCH_CACHE_SIZE", "4096"))
+
+# TfidfVectorizer parameters and the lowest score that counts as a match, per encoder
+BACKENDS = {
+    "tfidf": ({"stop_words": "english"}, 0.3),
+    "chargram": ({"analyzer": "char_wb", "ngram_range": (3, 5), "sublinear_tf": True}, 0.35),
+}
+
+
+def intent_texts(intents):
+    """(texts to index, intent row of each text): every description, then every example."""
+    texts = intents["description"].tolist()
+    labels = list(range(len(texts)))
+    if "examples" in intents.columns:
+        for row, examples in enumerate(intents["examples"].fillna("")):
+            for example in str(examples).split("|"):
+                if example.strip():
+                    texts.append(example.strip())
+                    labels.append(row)
+    return texts, np.array(labels)
+
+
+def _normalize_rows(matrix):
+    from scipy.sparse import diags
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (diags(1 / norms) @ matrix).tocsr()
+
+
+def _top_k(scores, k):
+    """(indices, scores) of the k highest scores in each row, best first."""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class VectorIndex:
+    """Top-k cosine search over labelled rows, returning the best-scoring labels.
+
+    ``index`` holds the L2-normalized row vectors as columns (terms x rows), the
+    layout the catalog builds and build_index.py saves, and ``labels`` gives
+    the item (intent) of each row.
+    """
+
+    def __init__(self, index, labels, ann_min_rows=ANN_MIN_ROWS, probes=ANN_PROBES, seed=0):
+        self.index = index
+        self.labels = np.asarray(labels)
+        self.items = int(self.labels.max()) + 1 if len(self.labels) else 0
+        # Rows sorted by label, so an item's best row is one maximum.reduceat
+        self._order = np.argsort(self.labels, kind="stable")
+        self._starts = np.searchsorted(self.labels[self._order], np.arange(self.items))
+        self._one_row_per_item = np.array_equal(self.labels, np.arange(len(self.labels)))
+        self.probes = probes
+        self.centroids = None
+        if index.shape[1] >= ann_min_rows:
+            self._build_clusters(int(np.sqrt(index.shape[1])), np.random.default_rng(seed))
+
+    def _build_clusters(self, clusters, rng, iterations=8, sample_per_cluster=32):
+        from scipy.sparse import csr_matrix
+
+        def assign(rows, centroids):
+            return np.asarray((rows @ centroids.T.tocsr()).argmax(axis=1)).ravel()
+
+        rows = self.index.T.tocsr()
+        n = rows.shape[0]
+        # Centroids are fitted on a sample; every row is then assigned once
+        sample = rows[rng.choice(n, min(n, clusters * sample_per_cluster), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], clusters, replace=False)]
+        for _ in range(iterations):
+            assignment = assign(sample, centroids)
+            members = csr_matrix(
+                (np.ones(len(assignment)), (assignment, np.arange(len(assignment)))),
+                shape=(clusters, sample.shape[0]),
+            )
+            summed = (members @ sample).tolil()
+            for c in np.flatnonzero(np.bincount(assignment, minlength=clusters) == 0):
+                summed[c] = sample[rng.integers(sample.shape[0])]  # reseed empty clusters
+            centroids = _normalize_rows(summed.tocsr())
+        assignment = assign(rows, centroids)
+        # Rows stored cluster by cluster, so a probe is a contiguous slice
+        order = np.argsort(assignment, kind="stable")
+        self.rows = rows[order]
+        self.row_labels = self.labels[order]
+        self.bounds = np.searchsorted(assignment[order], np.arange(clusters + 1))
+        self.centroids = centroids.T.tocsr()  # terms x clusters, like the index
+
+    @property
+    def approximate(self):
+        return self.centroids is not None
+
+    def _best_per_item(self, scores):
+        if self._one_row_per_item:
+            return scores
+        return np.maximum.reduceat(scores[:, self._order], self._starts, axis=1)
+
+    def search(self, queries, k=1):
+        """[(item indices, scores)] per query row, best first."""
+        if self.approximate:
+            return [self._search_clusters(queries[i], k) for i in range(queries.shape[0])]
+        top, scores = _top_k(self._best_per_item((queries @ self.index).toarray()), k)
+        return list(zip(top, scores))
+
+    def _row_scores(self, start, end, dense):
+        # rows[start:end] @ dense on the raw CSR arrays; slicing a csr_matrix costs more than the product
+        indptr = self.rows.indptr[start:end + 1]
+        products = self.rows.data[indptr[0]:indptr[-1]] * dense[self.rows.indices[indptr[0]:indptr[-1]]]
+        sums = np.add.reduceat(np.append(products, 0.0), indptr[:-1] - indptr[0])
+        return np.where(np.diff(indptr) > 0, sums, 0.0)
+
+    def _search_clusters(self, query, k):
+        centroid_scores = (query @ self.centroids).toarray().ravel()
+        probes = min(self.probes, len(centroid_scores))
+        nearest = np.argpartition(-centroid_scores, probes - 1)[:probes]
+        dense = query.toarray().ravel()
+        scores = np.concatenate([self._row_scores(self.bounds[c], self.bounds[c + 1], dense) for c in nearest])
+        labels = np.concatenate([self.row_labels[self.bounds[c]:self.bounds[c + 1]] for c in nearest])
+        order = np.argsort(-scores, kind="stable")
+        _, first = np.unique(labels[order], return_index=True)  # each item's best row
+        keep = order[np.sort(first)[:k]]
+        return labels[keep], scores[keep]
+
+
+class IntentMatcher:
+    """An encoder and a VectorIndex over intent texts, with a per-query result cache."""
+
+    def __init__(self, backend, vectorizer, index, labels, cache_size=MATCH_CACHE_SIZE, **index_options):
+        self.backend = backend
+        self.vectorizer = vectorizer
+        self.index = VectorIndex(index, labels, **index_options)
+        self.min_score = float(os.environ.get("AI_MATCH_MIN_SCORE", BACKENDS[backend][1]))
+        # Users send the same few phrases over and over
+        self.match = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def encode(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def search(self, texts, k=1):
+        """[(intent indices, scores)] for each text, best first."""
+        return self.index.search(self.encode(texts), k)
+
+    def _match(self, text, k=1):
+        # Only cache misses get here, so these stages time the real work of a /predict
+        with stage("predict", "vectorize"):
+            query_vec = self.encode([text])
+        with stage("predict", "similarity"):
+            indices, scores = self.index.search(query_vec, k)[0]
+        return tuple(zip(indices.tolist(), scores.tolist()))
+
+    def status(self):
+        cache = self.match.cache_info()
+        return {
+            "backend": self.backend,
+            "rows": self.index.index.shape[1],
+            "approximate": self.index.approximate,
+            "min_score": self.min_score,
+            "cache": {"hits": cache.hits, "misses": cache.misses, "size": cache.currsize},
+        }
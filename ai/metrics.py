@@ -0,0 +1,163 @@
+"""Request and stage latency metrics in the Prometheus text format.
+
+Handlers wrap each stage of their work in ``stage(endpoint, name)`` so the
+``/metrics`` histograms show which stage dominates (e.g. plot vs aggregate for
+the dashboard), and a middleware in app.py records the whole request. Values
+that other components already track (cache hits, render queue depth) are read
+at scrape time through ``REGISTRY.callback``.
+
+Metrics are kept per worker process, without the prometheus_client
+dependency; scrape each worker, or run a single worker per container.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Callback:
+    """A gauge or counter whose value is read from ``fn`` at scrape time.
+
+    ``fn`` returns a number, or a dict of {label value: number} for the single
+    label ``labelname``.
+    """
+
+    def __init__(self, name, documentation, fn, kind="gauge", labelname=None):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.kind = kind
+        self.labelname = labelname
+
+    def samples(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            yield f"{self.name} {_number(value)}"
+            return
+        for label, v in value.items():
+            yield f"{self.name}{_labels((self.labelname,), (label,))} {_number(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name, documentation, fn, kind="gauge", labelname=None):
+        return self.register(Callback(name, documentation, fn, kind, labelname))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "ai_request_duration_seconds", "Time to produce a response, by route.", ("method", "route", "status")
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ai_stage_duration_seconds", "Time spent in each stage of a request.", ("endpoint", "stage")
+))
+PAYLOAD_ROWS = REGISTRY.register(Histogram(
+    "ai_payload_rows", "Transactions (or descriptions) per request.", ("endpoint",), ROW_BUCKETS
+))
+ERRORS = REGISTRY.register(Counter(
+    "ai_errors_total", "Requests that failed with an unexpected exception.", ("endpoint", "exception")
+))
+
+
+def observe_stage(endpoint, name, seconds):
+    STAGE_SECONDS.observe(seconds, endpoint=endpoint, stage=name)
+
+
+@contextmanager
+def stage(endpoint, name):
+    """Time the enclosed block as stage ``name`` of ``endpoint``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(endpoint, name, time.perf_counter() - started)
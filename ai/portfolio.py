@@ -0,0 +1,147 @@
+"""Per-account PFM aggregates computed in parallel for a multi-account portfolio.
+
+Each account's transactions are ingested and aggregated in a worker process
+into an insights.InsightsAccumulator, which is sent back and merged into the
+consolidated view. The partials hold only sums, counts and per-label totals,
+so merging is cheap and the request takes about as long as its largest
+account. Small portfolios, and hosts with a single CPU, are aggregated in a
+thread instead, since there the round trip to the workers costs more than it
+saves.
+"""
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from categorize import CATEGORIES_FILE, MerchantClassifier
+from ingest import load_transactions
+from insights import InsightsAccumulator
+
+PORTFOLIO_WORKERS = int(os.environ.get("PFM_PORTFOLIO_WORKERS", str(min(4, os.cpu_count() or 1))))
+PORTFOLIO_INLINE_ROWS = int(os.environ.get("PFM_PORTFOLIO_INLINE_ROWS", "5000"))
+PORTFOLIO_QUEUE_LIMIT = int(os.environ.get("PFM_PORTFOLIO_QUEUE_LIMIT", "8"))
+
+_classifier = None
+
+
+class PortfolioPoolSaturated(Exception):
+    pass
+
+
+def _init_worker(categories_file):
+    global _classifier
+    _classifier = MerchantClassifier.from_csv(categories_file)
+
+
+def _ping():
+    return os.getpid()
+
+
+def account_partial(transactions, classifier=None):
+    """An InsightsAccumulator holding one account's transactions."""
+    accumulator = InsightsAccumulator(classifier or _classifier)
+    if transactions:
+        accumulator.add(load_transactions(transactions))
+    return accumulator
+
+
+class PortfolioPool:
+    """Process pool that turns {account id: transactions} into per-account partial aggregates.
+
+    At most ``workers`` portfolios are aggregated at once and at most
+    ``queue_limit`` more wait; anything beyond that is refused with
+    PortfolioPoolSaturated so the caller can answer 503.
+    """
+
+    def __init__(self, classifier, workers=PORTFOLIO_WORKERS, inline_rows=PORTFOLIO_INLINE_ROWS,
+                 categories_file=CATEGORIES_FILE, queue_limit=PORTFOLIO_QUEUE_LIMIT):
+        self.classifier = classifier
+        self.workers = workers
+        self.inline_rows = inline_rows
+        self.categories_file = categories_file
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._pending = 0
+        self._warm = False
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.categories_file,),
+            )
+        return self._executor
+
+    async def warm(self):
+        if self.workers < 2:
+            return
+        executor = self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.workers)))
+        self._warm = True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._warm = False
+
+    @property
+    def in_flight(self):
+        return self._pending
+
+    def status(self):
+        return {
+            "warm": self._warm or self.workers < 2,
+            "started": self._executor is not None,
+            "workers": self.workers,
+            "inline_rows": self.inline_rows,
+            "in_flight": self._pending,
+        }
+
+    @contextlib.contextmanager
+    def admit(self):
+        """Reserve a slot for one portfolio for the duration of the block, or raise PortfolioPoolSaturated."""
+        if self._pending >= max(self.workers, 1) + self.queue_limit:
+            raise PortfolioPoolSaturated(
+                f"Portfolio aggregation is busy ({self._pending} portfolios in flight), try again shortly."
+            )
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+
+    async def partials(self, accounts):
+        """Returns ({account id: InsightsAccumulator}, {"partials": ms}) for ``accounts``.
+
+        Call inside admit().
+        """
+        started = time.perf_counter()
+        rows = sum(len(transactions) for transactions in accounts.values())
+        if self.workers < 2 or len(accounts) < 2 or rows <= self.inline_rows:
+            partials = await asyncio.to_thread(
+                lambda: {account: account_partial(t, self.classifier) for account, t in accounts.items()}
+            )
+        else:
+            executor = self.start()
+            loop = asyncio.get_running_loop()
+            try:
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(executor, account_partial, transactions)
+                    for transactions in accounts.values()
+                ))
+            except BrokenProcessPool:
+                self._executor = None
+                self._warm = False
+                raise
+            self._warm = True
+            partials = dict(zip(accounts, results))
+            for partial in partials.values():
+                partial.classifier = self.classifier
+        return partials, {"partials": (time.perf_counter() - started) * 1000}
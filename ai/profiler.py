@@ -0,0 +1,89 @@
+"""Opt-in sampling profiler for a running AI service worker.
+
+When ``AI_PROFILE_INTERVAL_MS`` is set, a daemon thread snapshots the Python
+stack of every thread in the worker at that interval and counts identical
+stacks. ``GET /debug/profile`` returns the counts in the collapsed-stack format
+read by flamegraph.pl and speedscope. Render worker processes are not sampled;
+their plot and encode times are in the /metrics stage histograms.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+
+PROFILE_INTERVAL_MS = float(os.environ.get("AI_PROFILE_INTERVAL_MS", "0"))
+PROFILE_MAX_STACKS = int(os.environ.get("AI_PROFILE_MAX_STACKS", "10000"))
+PROFILE_MAX_DEPTH = 64
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, max_stacks=PROFILE_MAX_STACKS):
+        self.interval = interval_ms / 1000
+        self.max_stacks = max_stacks
+        self.samples = 0
+        self.dropped = 0
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = [_collapse(frame) for ident, frame in sys._current_frames().items() if ident != own]
+            with self._lock:
+                self.samples += 1
+                for stack in stacks:
+                    # Cap distinct stacks so a long run cannot grow without bound
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self.dropped += 1
+
+    def collapsed(self, reset=False):
+        """The sampled stacks as ``frame;frame;... count`` lines, most frequent first."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+            if reset:
+                self._stacks.clear()
+                self.samples = self.dropped = 0
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": len(self._stacks),
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,339 @@
+"""PFM dashboard rendering in a pool of worker processes.
+
+A dashboard render takes long enough to stall the event loop and pyplot keeps
+global state, so charts are drawn in separate processes that have matplotlib
+preloaded with the Agg backend and only use the object-oriented Figure API.
+Each worker keeps its figures between renders (see DashboardTemplate), so a
+render only updates the bars before the image is encoded.
+"""
+import asyncio
+import contextlib
+import functools
+import math
+import multiprocessing
+import numbers
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+RENDER_WORKERS = int(os.environ.get("PFM_RENDER_WORKERS", "2"))
+RENDER_QUEUE_LIMIT = int(os.environ.get("PFM_RENDER_QUEUE_LIMIT", "8"))
+# Figure templates kept per worker, one per (size, dpi) requested
+RENDER_TEMPLATES = int(os.environ.get("PFM_RENDER_TEMPLATES", "4"))
+LAYOUT_LABEL_STEP = 8  # characters; layouts are fitted per panel for labels up to a multiple of this
+
+IMAGE_TYPES = {"png": "image/png", "svg": "image/svg+xml", "webp": "image/webp"}
+
+# (insights key, title, y label, x label, bar color) for each panel of the 2x2 grid
+CHARTS = [
+    ("monthly_spending_trend", "Monthly Spending Trend", "Net Amount (AED)", "Month", "skyblue"),
+    ("spending_by_payment_mode", "Spending by Payment Mode", "Amount (AED)", None, "orange"),
+    ("transaction_type_breakdown", "Transaction Type Breakdown", "Amount (AED)", None, "green"),
+    ("top_spending_merchants", "Top Spending Merchants", "Amount (AED)", None, "purple"),
+]
+
+
+class RenderPoolSaturated(Exception):
+    pass
+
+
+class ImageNotAcceptable(Exception):
+    pass
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    _template((14, 8), 100)  # the default size, so the first render is already warm
+
+
+def _ping():
+    return os.getpid()
+
+
+def _has_data(series):
+    return bool(series) and all(isinstance(v, numbers.Real) for v in series.values())
+
+
+class _Panel:
+    """One axes of a DashboardTemplate: a pool of bar patches and a hidden "No Data" label."""
+
+    def __init__(self, ax, title, ylabel, xlabel, color):
+        self.ax = ax
+        self.color = color
+        self.bars = []
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        if xlabel:
+            ax.set_xlabel(xlabel)
+        ax.tick_params(axis="x", rotation=45)
+        self.no_data = ax.text(0.5, 0.5, "No Data", ha="center", va="center", transform=ax.transAxes, visible=False)
+
+    def _show(self, has_data):
+        if has_data:
+            self.ax.set_axis_on()
+        else:
+            self.ax.set_axis_off()
+        self.no_data.set_visible(not has_data)
+
+    def _set_bars(self, values):
+        if len(values) > len(self.bars):
+            start = len(self.bars)
+            extra = self.ax.bar(range(start, len(values)), [0.0] * (len(values) - start), width=0.5, color=self.color)
+            self.bars.extend(extra.patches)
+        for i, bar in enumerate(self.bars):
+            bar.set_visible(i < len(values))
+            if i < len(values):
+                bar.set_height(values[i])
+
+    @staticmethod
+    def label_chars(series):
+        """Longest x tick label in ``series`` rounded up to LAYOUT_LABEL_STEP, or None for "No Data"."""
+        if not _has_data(series):
+            return None
+        longest = max(len(str(label)) for label in series)
+        return math.ceil(longest / LAYOUT_LABEL_STEP) * LAYOUT_LABEL_STEP
+
+    def placeholder(self, label_chars):
+        """The widest ticks a layout for ``label_chars`` has to fit, on both axes."""
+        self._set_bars([])
+        self._show(label_chars is not None)
+        if label_chars is not None:
+            self.ax.set_xticks(range(3), ["0" * label_chars] * 3)
+            self.ax.set_xlim(-0.5, 2.5)
+            self.ax.set_ylim(-750000, 750000, auto=None)  # keep y autoscaling for update()
+
+    def update(self, series):
+        if not _has_data(series):
+            self._set_bars([])
+            self._show(False)
+            return
+        self._show(True)
+        self._set_bars(list(series.values()))
+        self.ax.set_xticks(range(len(series)), [str(label) for label in series])
+        self.ax.set_xlim(-0.5, len(series) - 0.5)
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view(scalex=False)
+
+
+class DashboardTemplate:
+    """A 2x2 dashboard figure kept warm between renders.
+
+    Titles, axis labels and tick styles are set once. A render only changes
+    the bar heights, ticks and limits, and shows or hides each panel's
+    "No Data" label. Instead of running tight_layout on every render, the
+    layout is fitted once per combination of panels shown and their longest
+    x tick label (rounded up to LAYOUT_LABEL_STEP characters) and reused.
+    """
+
+    def __init__(self, figsize, dpi):
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.panels = [_Panel(ax, *chart[1:]) for ax, chart in zip(self.fig.subplots(2, 2).flat, CHARTS)]
+        self.layouts = {}
+        self.layout = None
+
+    def _fit_layout(self, label_chars):
+        if label_chars not in self.layouts:
+            for panel, chars in zip(self.panels, label_chars):
+                panel.placeholder(chars)
+            self.fig.tight_layout()
+            params = self.fig.subplotpars
+            self.layouts[label_chars] = {
+                name: getattr(params, name) for name in ("left", "right", "bottom", "top", "wspace", "hspace")
+            }
+        if self.layout != label_chars:
+            self.fig.subplots_adjust(**self.layouts[label_chars])
+            self.layout = label_chars
+
+    def update(self, insights):
+        series = [insights.get(key) for key, *_ in CHARTS]
+        self._fit_layout(tuple(_Panel.label_chars(values) for values in series))
+        for panel, values in zip(self.panels, series):
+            panel.update(values)
+        return self.fig
+
+
+_templates = OrderedDict()  # per worker process: (figsize, dpi) -> DashboardTemplate
+
+
+def _template(figsize, dpi):
+    key = (tuple(figsize), dpi)
+    if key in _templates:
+        _templates.move_to_end(key)
+    else:
+        _templates[key] = DashboardTemplate(figsize, dpi)
+        while len(_templates) > RENDER_TEMPLATES:
+            _templates.popitem(last=False)
+    return _templates[key]
+
+
+def render_dashboard(insights, fmt="png", dpi=100, figsize=(14, 8)):
+    """Draw the four PFM panels; returns (image bytes, {"plot": ms, "encode": ms})."""
+    started = time.perf_counter()
+    fig = _template(figsize, dpi).update(insights)
+    plotted = time.perf_counter()
+    buf = BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi)
+    return buf.getvalue(), {
+        "plot": (plotted - started) * 1000,
+        "encode": (time.perf_counter() - plotted) * 1000,
+    }
+
+
+class RenderPool:
+    """Bounded process pool for dashboard renders.
+
+    At most ``workers`` renders run at once and at most ``queue_limit`` more
+    wait for a free worker; anything beyond that is refused with
+    RenderPoolSaturated so the caller can answer 503 instead of piling up work.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, queue_limit=RENDER_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._pending = 0  # admitted requests, from admit() until the response is ready
+        self._submitted = 0  # renders handed to the executor and not yet finished
+        self._warm = False
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def warm(self):
+        executor = self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.workers)))
+        self._warm = True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._warm = False
+
+    @property
+    def in_flight(self):
+        return self._pending
+
+    @property
+    def queue_depth(self):
+        # Only renders actually submitted; admitted requests may still be reading
+        # their body or be answered from the cache
+        return max(self._submitted - self.workers, 0)
+
+    def status(self):
+        return {
+            "warm": self._warm,
+            "workers": self.workers,
+            "in_flight": self._pending,
+            "rendering": self._submitted,
+            "queue_depth": self.queue_depth,
+        }
+
+    @contextlib.contextmanager
+    def admit(self):
+        """Reserve a render slot for the duration of the block.
+
+        Raises RenderPoolSaturated straight away when the workers and the queue
+        are full, so requests that would be refused skip reading, hashing and
+        aggregating their transactions too.
+        """
+        if self._pending >= self.workers + self.queue_limit:
+            raise RenderPoolSaturated(
+                f"Dashboard renderer is busy ({self._pending} renders in flight), try again shortly."
+            )
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+
+    async def render(self, insights, **options):
+        """Render a dashboard; returns (image bytes, {"queue": ms, "plot": ms, "encode": ms}).
+
+        Call inside admit(). ``options`` are passed to render_dashboard (fmt, dpi, figsize).
+        """
+        executor = self.start()
+        submitted = time.perf_counter()
+        self._submitted += 1
+        try:
+            image, timings = await asyncio.get_running_loop().run_in_executor(
+                executor, functools.partial(render_dashboard, insights, **options)
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); drop the pool so the next render gets a fresh one
+            self._executor = None
+            self._warm = False
+            raise
+        finally:
+            self._submitted -= 1
+        self._warm = True
+        total_ms = (time.perf_counter() - submitted) * 1000
+        return image, {"queue": max(total_ms - sum(timings.values()), 0.0), **timings}
+
+
+def server_timing(timings):
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
+def _weighted(header):
+    """(token, q) for each entry of an Accept-style header, highest q first; q=0 means refused."""
+    entries = []
+    for part in (header or "").split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token:
+            entries.append((token.lower(), q))
+    return sorted(entries, key=lambda entry: -entry[1])  # stable, so ties keep the client's order
+
+
+def negotiate_image(accept, fmt=None):
+    """Pick the binary image format to send for an Accept header.
+
+    Returns None when the client prefers the legacy base64-in-JSON body. An
+    explicit ``fmt`` is sent as binary unless the Accept header prefers JSON
+    or refuses it; raises ImageNotAcceptable when the header allows neither.
+    """
+    entries = _weighted(accept if accept and accept.strip() else "*/*")
+    refused = {media_type for media_type, q in entries if q <= 0}
+    allowed = [name for name, image_type in IMAGE_TYPES.items() if image_type not in refused and fmt in (None, name)]
+    for media_type, q in entries:
+        if q <= 0:
+            break
+        if media_type in ("application/json", "application/*"):
+            return None
+        if media_type == "*/*" and not fmt:
+            return None
+        if media_type in ("*/*", "image/*") and allowed:
+            return allowed[0]
+        for name in allowed:
+            if media_type == IMAGE_TYPES[name]:
+                return name
+    if fmt:
+        raise ImageNotAcceptable(f"format={fmt} was requested but the Accept header does not allow {IMAGE_TYPES[fmt]}.")
+    return None
+
+
+def accepts_encoding(accept_encoding, coding):
+    """Whether an Accept-Encoding header allows ``coding``; ``gzip;q=0`` refuses gzip even after ``*``."""
+    weights = dict(_weighted(accept_encoding))
+    return weights.get(coding, weights.get("*", 0.0)) > 0
+
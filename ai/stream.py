@@ -0,0 +1,141 @@
+"""Incremental parsing of large transaction uploads.
+
+The buffered endpoints read the whole body, decode it into a list of dicts and
+build one DataFrame from it, so peak memory grows with the length of the
+history. The streaming endpoints instead read the body chunk by chunk and hand
+it on in batches of at most ``STREAM_BATCH_SIZE`` transactions, which are
+folded into an insights.InsightsAccumulator and then dropped.
+
+Two body formats are accepted: NDJSON (one transaction object per line, the
+natural format for exporting a long history) and a plain JSON array, which is
+decoded one element at a time so existing clients can stream their current
+payloads unchanged.
+"""
+import codecs
+import json
+import os
+
+STREAM_BATCH_SIZE = int(os.environ.get("AI_STREAM_BATCH_SIZE", "5000"))
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+
+
+class StreamFormatError(ValueError):
+    pass
+
+
+def is_ndjson(content_type):
+    return (content_type or "").split(";")[0].strip().lower() in NDJSON_TYPES
+
+
+class NDJSONParser:
+    def __init__(self):
+        self._pending = b""
+        self._line = 0
+
+    def _parse(self, line):
+        self._line += 1
+        if not line.strip():
+            return None
+        try:
+            transaction = json.loads(line)
+        except ValueError as e:
+            raise StreamFormatError(f"Line {self._line}: {e}") from None
+        if not isinstance(transaction, dict):
+            raise StreamFormatError(f"Line {self._line}: expected a transaction object")
+        return transaction
+
+    def feed(self, data):
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        return [t for t in map(self._parse, lines) if t is not None]
+
+    def close(self):
+        line, self._pending = self._pending, b""
+        transaction = self._parse(line)
+        return [] if transaction is None else [transaction]
+
+
+class JSONArrayParser:
+    """Decode the elements of a top-level JSON array as its bytes arrive."""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"  # start -> item -> separator -> ... -> end
+        self._count = 0
+
+    def _error(self, message):
+        return StreamFormatError(f"Element {self._count + 1}: {message}")
+
+    def feed(self, data):
+        self._buffer += self._text.decode(data)
+        transactions = []
+        buffer, pos = self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == "start":
+                if char != "[":
+                    raise StreamFormatError("Expected a JSON array of transactions")
+                self._state, pos = "first", pos + 1
+            elif self._state in ("first", "separator") and char == "]":
+                self._state, pos = "end", pos + 1
+            elif self._state == "separator":
+                if char != ",":
+                    raise self._error("expected ',' or ']'")
+                self._state, pos = "item", pos + 1
+            elif self._state in ("first", "item"):
+                try:
+                    transaction, end = self._decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    break  # the element continues in the next chunk
+                if end == len(buffer) and not isinstance(transaction, (dict, list, str)):
+                    break  # a number may continue in the next chunk
+                if not isinstance(transaction, dict):
+                    raise self._error("expected a transaction object")
+                transactions.append(transaction)
+                self._count += 1
+                self._state, pos = "separator", end
+            else:
+                raise StreamFormatError("Unexpected data after the JSON array")
+        self._buffer = buffer[pos:]
+        return transactions
+
+    def close(self):
+        self._buffer += self._text.decode(b"", final=True)
+        if self._state == "start" and not self._buffer.strip():
+            return []  # empty body
+        if self._state != "end":
+            if self._buffer.strip():
+                try:
+                    self._decoder.decode(self._buffer)
+                except ValueError as e:
+                    raise self._error(str(e)) from None
+            raise StreamFormatError("Truncated JSON array")
+        return []
+
+
+async def transaction_batches(chunks, ndjson=True, batch_size=STREAM_BATCH_SIZE, digest=None):
+    """Yield lists of at most ``batch_size`` transactions from an async iterator of body chunks.
+
+    ``digest`` (e.g. a hashlib.sha256()) is updated with the raw bytes, so the
+    caller can key a cache on the body without keeping it.
+    """
+    parser = NDJSONParser() if ndjson else JSONArrayParser()
+    batch = []
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if digest is not None:
+            digest.update(chunk)
+        batch.extend(parser.feed(chunk))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    batch.extend(parser.close())
+    if batch:
+        yield batch
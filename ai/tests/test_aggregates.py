@@ -0,0 +1,91 @@
+"""AggregateStore's running totals against compute_insights over the same history.
+
+Run from the ai/ directory: python -m unittest discover tests
+"""
+import copy
+import math
+import unittest
+
+from aggregates import AggregateStore
+from benchmarks.synthetic import generate_transactions
+from categorize import MerchantClassifier
+from ingest import load_transactions
+from insights import compute_insights
+
+CLASSIFIER = MerchantClassifier.from_csv()
+
+
+class AggregateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = AggregateStore(":memory:", classifier=CLASSIFIER)
+        self.history = generate_transactions(600, seed=7)
+
+    def tearDown(self):
+        self.store.close()
+
+    def assertMatchesHistory(self, history, account_id="acc"):
+        df = load_transactions(history)
+        expected = compute_insights(df)
+        actual = self.store.insights(account_id)
+        self.assertEqual(sorted(actual), sorted(expected))
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                self.assertEqual(sorted(actual[key]), sorted(value), key)
+                for label, amount in value.items():
+                    self.assertAlmostEqual(actual[key][label], amount, places=6, msg=f"{key}[{label}]")
+            elif isinstance(value, float) and math.isnan(value):
+                self.assertTrue(math.isnan(actual[key]), key)
+            else:
+                self.assertAlmostEqual(actual[key], value, places=6, msg=key)
+        total_spent, categories = self.store.spending(account_id)
+        expected_categories = {k: v for k, v in CLASSIFIER.spend_by_category(df).items() if v}
+        self.assertAlmostEqual(total_spent, -df.loc[df["SignedAmount"] < 0, "SignedAmount"].sum(), places=6)
+        self.assertEqual(sorted(k for k, v in categories.items() if abs(v) > 1e-9), sorted(expected_categories))
+        for category, spend in expected_categories.items():
+            self.assertAlmostEqual(categories[category], spend, places=6, msg=category)
+
+    def test_insert(self):
+        counts = self.store.ingest("acc", self.history)
+        self.assertEqual(counts, {"inserted": 600, "updated": 0, "unchanged": 0, "skipped": 0})
+        self.assertMatchesHistory(self.history)
+
+    def test_overlapping_batches_insert_each_transaction_once(self):
+        self.store.ingest("acc", self.history[:400])
+        counts = self.store.ingest("acc", self.history[300:])
+        self.assertEqual(counts, {"inserted": 200, "updated": 0, "unchanged": 100, "skipped": 0})
+        self.assertMatchesHistory(self.history)
+
+    def test_repost_is_unchanged(self):
+        self.store.ingest("acc", self.history)
+        counts = self.store.ingest("acc", self.history)
+        self.assertEqual(counts, {"inserted": 0, "updated": 0, "unchanged": 600, "skipped": 0})
+        self.assertMatchesHistory(self.history)
+
+    def test_update_subtracts_the_old_contribution(self):
+        self.store.ingest("acc", self.history)
+        edited = copy.deepcopy(self.history)
+        for transaction in edited[:50]:
+            transaction["Amount"]["Amount"] = f"{float(transaction['Amount']['Amount']) * 2 + 1:.2f}"
+        for transaction in edited[50:80]:
+            transaction["MerchantDetails"] = {"MerchantName": "Corrected Merchant"}
+        for transaction in edited[80:100]:
+            transaction["TransactionDateTime"] = "2022-06-15T12:00:00+04:00"
+        counts = self.store.ingest("acc", edited[:100])
+        self.assertEqual(counts, {"inserted": 0, "updated": 100, "unchanged": 0, "skipped": 0})
+        self.assertMatchesHistory(edited)
+
+    def test_accounts_are_separate(self):
+        self.store.ingest("a", self.history[:300])
+        self.store.ingest("b", self.history[300:])
+        self.assertMatchesHistory(self.history[:300], "a")
+        self.assertMatchesHistory(self.history[300:], "b")
+
+    def test_transactions_without_id_are_skipped_not_merged(self):
+        transaction = {k: v for k, v in self.history[0].items() if k != "TransactionId"}
+        counts = self.store.ingest("acc", [transaction, dict(transaction), self.history[1]])
+        self.assertEqual(counts, {"inserted": 1, "updated": 0, "unchanged": 0, "skipped": 2})
+        self.assertMatchesHistory(self.history[1:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""CardEngine against the if-chain it replaced, on the original eight cards.
+
+Run from the ai/ directory: python -m unittest discover tests
+"""
+import json
+import random
+import unittest
+
+from benchmarks.bench_cards import legacy_score_cards
+from cards import CardEngine, parse_card_listing
+from catalog import CARD_LISTING_FILE, CARDS_FILE
+
+CATEGORIES = ["travel", "food", "grocery", "entertainment", "shopping", "bills"]
+# The cards the legacy chain knew, in the order cards.json still lists them
+LEGACY_CARDS = 8
+
+
+def random_profiles(n, seed=0):
+    """(total_spent, {category: spend}) pairs, including zero spend and the 1000/5000 thresholds."""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(n):
+        spend = {}
+        for category in CATEGORIES:
+            if rng.random() < 0.6:
+                spend[category] = round(rng.choice([rng.uniform(0, 200), rng.uniform(0, 5000), 0.0, 50.0]), 2)
+        total = sum(spend.values()) + rng.choice([0, 0, rng.uniform(0, 3000)])
+        if rng.random() < 0.05:
+            total = rng.choice([1000.0, 5000.0, 0.0])
+        profiles.append((total, spend))
+    return profiles
+
+
+class CardEngineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(CARDS_FILE, encoding="utf-8") as f:
+            cls.definitions = json.load(f)
+        with open(CARD_LISTING_FILE, encoding="utf-8") as f:
+            cls.listing = parse_card_listing(f.read())
+
+    def test_matches_legacy_rule_chain(self):
+        definitions = self.definitions[:LEGACY_CARDS]
+        legacy_cards = {d["category"]: d for d in definitions}
+        engine = CardEngine(definitions, self.listing)
+        for total, spend in random_profiles(5000):
+            with self.subTest(total=total, spend=spend):
+                self.assertEqual(engine.recommend(total, spend), legacy_score_cards(legacy_cards, total, spend))
+
+    def test_batched_matches_single(self):
+        engine = CardEngine(self.definitions, self.listing)
+        profiles = random_profiles(500, seed=1)
+        self.assertEqual(engine.recommend_many(profiles), [engine.recommend(*p) for p in profiles])
+
+    def test_full_catalog_recommends_one_to_four_cards(self):
+        engine = CardEngine(self.definitions, self.listing)
+        for total, spend in random_profiles(500, seed=2):
+            self.assertTrue(1 <= len(engine.recommend(total, spend)) <= 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Accept and Accept-Encoding handling for the dashboard image routes.
+
+Run from the ai/ directory: python -m unittest discover tests
+"""
+import unittest
+
+from render import ImageNotAcceptable, accepts_encoding, negotiate_image
+
+
+class NegotiateImageTest(unittest.TestCase):
+    def test_without_format_json_stays_the_default(self):
+        for accept in (None, "", "*/*", "text/html", "application/json"):
+            self.assertIsNone(negotiate_image(accept), accept)
+
+    def test_without_format_image_types_pick_the_format(self):
+        self.assertEqual(negotiate_image("image/webp"), "webp")
+        self.assertEqual(negotiate_image("image/*"), "png")
+        self.assertEqual(negotiate_image("image/png;q=0, image/*"), "svg")
+
+    def test_q_values_order_the_choices(self):
+        self.assertIsNone(negotiate_image("image/webp;q=0.5, application/json"))
+        self.assertEqual(negotiate_image("image/webp, application/json;q=0.5"), "webp")
+
+    def test_explicit_format_is_honoured_by_wildcards(self):
+        for accept in (None, "*/*", "image/*", "image/svg+xml"):
+            self.assertEqual(negotiate_image(accept, "svg"), "svg", accept)
+
+    def test_explicit_format_with_json_accept_is_base64(self):
+        self.assertIsNone(negotiate_image("application/json", "svg"))
+
+    def test_conflicting_format_is_not_acceptable(self):
+        for accept in ("image/png", "text/html", "image/svg+xml;q=0, */*", "*/*;q=0"):
+            with self.assertRaises(ImageNotAcceptable, msg=accept):
+                negotiate_image(accept, "svg")
+
+
+class AcceptsEncodingTest(unittest.TestCase):
+    def test_gzip(self):
+        for header, expected in [
+            ("gzip", True),
+            ("gzip, deflate, br", True),
+            ("GZIP;q=0.5", True),
+            ("*", True),
+            ("gzip;q=0", False),
+            ("*, gzip;q=0", False),
+            ("deflate, br", False),
+            (None, False),
+        ]:
+            self.assertEqual(accepts_encoding(header, "gzip"), expected, header)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""The /stream routes against their buffered counterparts, for NDJSON and JSON array bodies.
+
+Run from the ai/ directory: python -m unittest discover tests
+"""
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+import app
+from benchmarks.synthetic import generate_transactions
+from stream import STREAM_BATCH_SIZE
+
+# More than two stream batches, over several accounts and months
+TRANSACTIONS = generate_transactions(2 * STREAM_BATCH_SIZE + 1234, accounts=3)
+BODIES = {
+    "ndjson": ("application/x-ndjson", "".join(json.dumps(t) + "\n" for t in TRANSACTIONS).encode("utf-8")),
+    "array": ("application/json", json.dumps(TRANSACTIONS).encode("utf-8")),
+}
+
+
+class StreamRoutesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app.app)
+        cls.client.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+
+    def stream(self, path, body, accept=None):
+        content_type, content = BODIES[body]
+        headers = {"Content-Type": content_type, **({"Accept": accept} if accept else {})}
+        return self.client.post(path, content=content, headers=headers)
+
+    def test_card_recommendations(self):
+        buffered = self.client.post("/credit-card-recommendations", json={"transactions": TRANSACTIONS})
+        self.assertEqual(buffered.status_code, 200)
+        for body in BODIES:
+            with self.subTest(body=body):
+                streamed = self.stream("/credit-card-recommendations/stream", body)
+                self.assertEqual(streamed.status_code, 200)
+                self.assertEqual(streamed.json(), buffered.json())
+
+    def test_dashboard_image(self):
+        buffered = self.client.post("/pfm-dashboard-image", json=TRANSACTIONS, headers={"Accept": "image/png"})
+        self.assertEqual(buffered.status_code, 200)
+        for body in BODIES:
+            with self.subTest(body=body):
+                streamed = self.stream("/pfm-dashboard-image/stream", body, accept="image/png")
+                self.assertEqual(streamed.status_code, 200)
+                self.assertEqual(streamed.content, buffered.content)
+
+    def test_insights_match_compute_insights(self):
+        # The dashboard's numbers, compared directly rather than through the rendered image
+        from ingest import load_transactions
+        from insights import InsightsAccumulator, compact_insights, compute_insights
+
+        accumulator = InsightsAccumulator()
+        for start in range(0, len(TRANSACTIONS), STREAM_BATCH_SIZE):
+            accumulator.add(load_transactions(TRANSACTIONS[start:start + STREAM_BATCH_SIZE]))
+        expected = compact_insights(compute_insights(load_transactions(TRANSACTIONS)))
+        self.assertEqual(compact_insights(accumulator.insights()), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
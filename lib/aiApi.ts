@@ -168,6 +168,131 @@ export async function getPFMDashboardImage(
   }
 }
 
+export interface PFMInsightsRequest {
+  transactions: any[];
+  start_date?: string;
+  end_date?: string;
+  account_ids?: string[];
+  top_n?: number;
+}
+
+export interface PFMInsightsResponse {
+  total_transactions: number;
+  total_spent: number;
+  total_income: number;
+  net_balance_change: number;
+  average_transaction_amount: number | null;
+  monthly_spending_trend: Record<string, number>;
+  top_spending_merchants: Record<string, number>;
+  spending_by_payment_mode: Record<string, number>;
+  transaction_type_breakdown: Record<string, number>;
+}
+
+/**
+ * Get PFM dashboard aggregates as JSON for client-side charts
+ */
+export async function getPFMInsights(
+  request: PFMInsightsRequest
+): Promise<PFMInsightsResponse> {
+  try {
+    const response = await fetch(`${AI_BASE_URL}/pfm-insights`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(request),
+    });
+
+    if (!response.ok) {
+      throw new Error(`AI service error: ${response.statusText}`);
+    }
+
+    const data = await response.json();
+    return data;
+  } catch (error) {
+    console.error("Error getting PFM insights:", error);
+    throw error;
+  }
+}
+
+export interface PortfolioView {
+  insights: PFMInsightsResponse;
+  recommendations: CreditCardRecommendationsResponse;
+}
+
+export interface PortfolioInsightsResponse {
+  accounts: Record<string, PortfolioView>;
+  consolidated: PortfolioView;
+}
+
+/**
+ * Get insights and card recommendations per account and across all accounts,
+ * from transactions grouped by account id
+ */
+export async function getPortfolioInsights(
+  accounts: Record<string, any[]>,
+  topN: number = 5
+): Promise<PortfolioInsightsResponse> {
+  try {
+    const response = await fetch(`${AI_BASE_URL}/portfolio-insights`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ accounts, top_n: topN }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`AI service error: ${response.statusText}`);
+    }
+
+    const data = await response.json();
+    return data;
+  } catch (error) {
+    console.error("Error getting portfolio insights:", error);
+    throw error;
+  }
+}
+
+export type PFMDashboardImageFormat = "png" | "svg" | "webp";
+
+const PFM_IMAGE_TYPES: Record<PFMDashboardImageFormat, string> = {
+  png: "image/png",
+  svg: "image/svg+xml",
+  webp: "image/webp",
+};
+
+/**
+ * Get the PFM dashboard as a binary image (no base64 overhead)
+ */
+export async function getPFMDashboardImageBlob(
+  transactions: any[],
+  format: PFMDashboardImageFormat = "webp"
+): Promise<Blob> {
+  try {
+    const response = await fetch(
+      `${AI_BASE_URL}/pfm-dashboard-image?format=${format}`,
+      {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Accept: PFM_IMAGE_TYPES[format],
+        },
+        body: JSON.stringify(transactions),
+      }
+    );
+
+    if (!response.ok) {
+      throw new Error(`AI service error: ${response.statusText}`);
+    }
+
+    return await response.blob();
+  } catch (error) {
+    console.error("Error getting PFM dashboard image:", error);
+    throw error;
+  }
+}
+
 /**
  * Check if AI service is available
  */
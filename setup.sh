@@ -34,6 +34,7 @@ fi
 echo "Installing Python packages..."
 source venv/bin/activate
 pip install -r requirements.txt
+python build_index.py
 deactivate
 
 cd ..